@@ -1,18 +1,32 @@
 """文件下载API路由"""
 from pathlib import Path
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request, Response
 from app.models.frame import RenderFrame
+from app.utils.responses import (
+    RangedFileResponse, x_accel_response, make_etag, stat_file, cache_validators, is_not_modified
+)
 
 router = APIRouter(prefix="/api/files", tags=["文件管理"])
 
+# 预览文件扩展名到MIME类型的映射
+_MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".exr": "image/x-exr",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+}
+_get_mime_type = _MIME_TYPES.get
+
 
 @router.get("/download/{frame_id}", summary="下载渲染结果")
-async def download_render_output(frame_id: int):
+async def download_render_output(frame_id: int, request: Request):
     """
     下载指定帧的渲染结果文件
 
     - **frame_id**: 渲染帧ID
+    - 支持 Range 请求（断点续传、多线程下载）
     """
     # 获取帧信息
     frame = await RenderFrame.get_or_none(id=frame_id)
@@ -25,26 +39,42 @@ async def download_render_output(frame_id: int):
 
     output_path = Path(frame.output_path)
 
-    if not output_path.exists():
+    stat_result = await stat_file(output_path)
+    if stat_result is None:
         raise HTTPException(status_code=404, detail="渲染结果文件不存在")
 
-    # 返回文件
-    return FileResponse(
+    # 文件未变化时直接返回304
+    etag = make_etag(frame.id, stat_result.st_mtime_ns, stat_result.st_size)
+    headers = cache_validators(etag, stat_result)
+    if is_not_modified(request.headers, etag, stat_result):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = f'attachment; filename="{output_path.name}"'
+
+    # nginx 前置时交由 nginx 发送文件
+    accel_response = x_accel_response(output_path, "application/octet-stream", headers)
+    if accel_response is not None:
+        return accel_response
+
+    # 返回文件（服务器支持时走 sendfile 零拷贝）
+    return RangedFileResponse(
         path=str(output_path),
+        range_header=request.headers.get("range"),
         filename=output_path.name,
         media_type="application/octet-stream",
-        headers={
-            "Content-Disposition": f'attachment; filename="{output_path.name}"'
-        }
+        headers=headers,
+        stat_result=stat_result,
+        method=request.method
     )
 
 
 @router.get("/preview/{frame_id}", summary="在线预览渲染结果")
-async def preview_render_output(frame_id: int):
+async def preview_render_output(frame_id: int, request: Request):
     """
     在线预览渲染结果（适用于图像文件）
 
     - **frame_id**: 渲染帧ID
+    - 支持 Range 请求
     """
     # 获取帧信息
     frame = await RenderFrame.get_or_none(id=frame_id)
@@ -57,27 +87,26 @@ async def preview_render_output(frame_id: int):
 
     output_path = Path(frame.output_path)
 
-    if not output_path.exists():
+    stat_result = await stat_file(output_path)
+    if stat_result is None:
         raise HTTPException(status_code=404, detail="渲染结果文件不存在")
 
+    # 根据帧ID和文件修改时间生成ETag，客户端缓存未变化时直接返回304
+    etag = make_etag(frame.id, stat_result.st_mtime_ns, stat_result.st_size)
+    cache_headers = cache_validators(etag, stat_result)
+    cache_headers["Cache-Control"] = "public, max-age=3600"  # 缓存1小时
+    if is_not_modified(request.headers, etag, stat_result):
+        return Response(status_code=304, headers=cache_headers)
+
     # 根据文件扩展名确定MIME类型
-    ext = output_path.suffix.lower()
-    mime_types = {
-        ".png": "image/png",
-        ".jpg": "image/jpeg",
-        ".jpeg": "image/jpeg",
-        ".exr": "image/x-exr",
-        ".tif": "image/tiff",
-        ".tiff": "image/tiff",
-    }
-
-    media_type = mime_types.get(ext, "application/octet-stream")
+    media_type = _get_mime_type(output_path.suffix.lower(), "application/octet-stream")
 
     # 返回文件用于在线预览
-    return FileResponse(
+    return RangedFileResponse(
         path=str(output_path),
+        range_header=request.headers.get("range"),
         media_type=media_type,
-        headers={
-            "Cache-Control": "public, max-age=3600"  # 缓存1小时
-        }
+        headers=cache_headers,
+        stat_result=stat_result,
+        method=request.method
     )
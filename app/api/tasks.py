@@ -1,16 +1,58 @@
 """任务管理API路由"""
+import asyncio
 from fastapi import APIRouter, HTTPException, Query
 from celery.result import AsyncResult
-from datetime import date
+from kombu.utils.uuid import uuid
 from app.schemas.task import TaskCreate, TaskResponse, TaskStatusResponse, TaskListResponse
 from app.schemas.frame import FrameResponse, FrameListResponse
 from app.models.task import RenderTask, TaskStatus
 from app.models.frame import RenderFrame, FrameStatus
-from app.celery_app.celery import celery_app
+from app.celery_app.celery import celery_app, mark_task_cancelled
 from app.celery_app.tasks import render_task, retry_render_frame
 
 router = APIRouter(prefix="/api/tasks", tags=["任务管理"])
 
+# 优先级（0-10）到队列的映射：0-3 低优先级，4-7 默认，8-10 高优先级
+_QUEUE_BY_PRIORITY = ("low_priority",) * 4 + ("default",) * 4 + ("high_priority",) * 3
+
+# 任务响应模型的字段列表
+_TASK_FIELDS = tuple(TaskResponse.model_fields.keys())
+# 列表接口直接查询的字段（progress_percentage 由已完成帧数和总帧数计算）
+_TASK_VALUE_FIELDS = tuple(field for field in _TASK_FIELDS if field != "progress_percentage")
+_FRAME_VALUE_FIELDS = (
+    "id", "task_id", "frame_number", "status", "output_path", "oss_output_path",
+    "render_time", "error_message", "created_at", "updated_at",
+)
+
+
+def _enum_value(value):
+    """取枚举字段的原始值"""
+    return value.value if hasattr(value, "value") else value
+
+
+def _to_task_response(task: RenderTask) -> TaskResponse:
+    """将任务实例转换为响应模型（数据来自数据库，跳过校验）"""
+    return TaskResponse.model_construct(
+        **{field: _enum_value(getattr(task, field)) for field in _TASK_FIELDS}
+    )
+
+
+def _task_row_to_response(row: dict) -> TaskResponse:
+    """将 .values() 查询得到的任务字典转换为响应模型（数据来自数据库，跳过校验）"""
+    row["render_engine"] = _enum_value(row["render_engine"])
+    row["status"] = _enum_value(row["status"])
+    total_frames = row["total_frames"]
+    row["progress_percentage"] = (
+        row["completed_frames"] / total_frames * 100 if total_frames else 0.0
+    )
+    return TaskResponse.model_construct(**row)
+
+
+def _frame_row_to_response(row: dict) -> FrameResponse:
+    """将 .values() 查询得到的帧字典转换为响应模型（数据来自数据库，跳过校验）"""
+    row["status"] = _enum_value(row["status"])
+    return FrameResponse.model_construct(**row)
+
 
 @router.post("/", response_model=TaskResponse, summary="创建渲染任务")
 async def create_task(task_data: TaskCreate):
@@ -24,8 +66,12 @@ async def create_task(task_data: TaskCreate):
     - **render_engine**: 渲染引擎（maya/ue）
     - **task_info**: 任务信息，包含执行任务所需的所有配置
     - **total_frames**: 总帧数
+    - **priority**: 任务优先级（0-10），0-3进入低优先级队列，4-7进入默认队列，8-10进入高优先级队列
     """
     try:
+        # 预先生成Celery任务ID，随任务记录一起写入，省去提交后的二次保存
+        celery_task_id = uuid()
+
         # 创建任务记录
         task = await RenderTask.create(
             unionid=task_data.unionid,
@@ -35,52 +81,19 @@ async def create_task(task_data: TaskCreate):
             render_engine=task_data.render_engine,
             task_info=task_data.task_info,
             total_frames=task_data.total_frames,
-            status=TaskStatus.PENDING
+            status=TaskStatus.PENDING,
+            celery_task_id=celery_task_id
         )
 
-        # 创建帧记录
-        today = date.today()
-        frames_data = [
-            {
-                "task_id": task.id,
-                "frame_number": i,
-                "status": FrameStatus.PENDING,
-                "p_date": today  # 手动设置分区日期（bulk_create不会自动填充auto_now_add字段）
-            }
-            for i in range(1, task_data.total_frames + 1)
-        ]
-        await RenderFrame.bulk_create([RenderFrame(**data) for data in frames_data])
-
-        # 提交异步任务到默认队列
-        celery_task = render_task.apply_async(
+        # 按优先级提交异步任务（帧记录由Worker在开始渲染前创建，接口响应时间与帧数无关）
+        render_task.apply_async(
             args=[task.id],
-            queue="default"
+            queue=_QUEUE_BY_PRIORITY[task_data.priority],
+            task_id=celery_task_id
         )
 
-        # 更新celery_task_id
-        task.celery_task_id = celery_task.id
-        await task.save()
-
         # 返回任务信息
-        return TaskResponse(
-            id=task.id,
-            unionid=task.unionid,
-            oss_file_path=task.oss_file_path,
-            file_path=task.file_path,
-            is_compressed=task.is_compressed,
-            render_engine=task.render_engine.value,
-            task_info=task.task_info,
-            status=task.status.value,
-            total_frames=task.total_frames,
-            completed_frames=task.completed_frames,
-            progress_percentage=task.progress_percentage,
-            is_deleted=task.is_deleted,
-            p_date=task.p_date,
-            celery_task_id=task.celery_task_id,
-            error_message=task.error_message,
-            created_at=task.created_at,
-            updated_at=task.updated_at
-        )
+        return _to_task_response(task)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"创建任务失败: {str(e)}")
@@ -94,39 +107,25 @@ async def get_task(task_id: int):
     if not task:
         raise HTTPException(status_code=404, detail=f"任务不存在: {task_id}")
 
-    return TaskResponse(
-        id=task.id,
-        unionid=task.unionid,
-        oss_file_path=task.oss_file_path,
-        file_path=task.file_path,
-        is_compressed=task.is_compressed,
-        render_engine=task.render_engine.value,
-        task_info=task.task_info,
-        status=task.status.value,
-        total_frames=task.total_frames,
-        completed_frames=task.completed_frames,
-        progress_percentage=task.progress_percentage,
-        is_deleted=task.is_deleted,
-        p_date=task.p_date,
-        celery_task_id=task.celery_task_id,
-        error_message=task.error_message,
-        created_at=task.created_at,
-        updated_at=task.updated_at
-    )
+    return _to_task_response(task)
 
 
 @router.get("/{task_id}/status", response_model=TaskStatusResponse, summary="获取任务状态")
 async def get_task_status(task_id: int):
     """获取任务状态（轻量级接口，用于轮询）"""
-    task = await RenderTask.get_or_none(id=task_id)
+    # 只查询需要的列，避免读取 task_info 等较大的字段
+    task = await RenderTask.filter(id=task_id).only(
+        "id", "status", "completed_frames", "total_frames", "error_message"
+    ).first()
 
     if not task:
         raise HTTPException(status_code=404, detail=f"任务不存在: {task_id}")
 
+    total_frames = task.total_frames
     return TaskStatusResponse(
         id=task.id,
         status=task.status.value,
-        progress_percentage=task.progress_percentage,
+        progress_percentage=task.completed_frames * 100 / total_frames if total_frames else 0.0,
         completed_frames=task.completed_frames,
         total_frames=task.total_frames,
         error_message=task.error_message
@@ -150,35 +149,15 @@ async def list_tasks(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"无效的任务状态: {status}")
 
-    # 获取总数
-    total = await query.count()
-
-    # 分页查询
-    tasks = await query.offset(offset).limit(limit).order_by("-created_at")
+    # 并发获取总数和分页数据（直接查询字典，跳过ORM实例构建）
+    # 帧记录由Worker创建，创建之前 total 为0、列表为空（任务的总帧数见任务详情的 total_frames）
+    total, rows = await asyncio.gather(
+        query.count(),
+        query.offset(offset).limit(limit).order_by("-created_at").values(*_TASK_VALUE_FIELDS)
+    )
 
     # 转换为响应模型
-    task_responses = [
-        TaskResponse(
-            id=task.id,
-            unionid=task.unionid,
-            oss_file_path=task.oss_file_path,
-            file_path=task.file_path,
-            is_compressed=task.is_compressed,
-            render_engine=task.render_engine.value,
-            task_info=task.task_info,
-            status=task.status.value,
-            total_frames=task.total_frames,
-            completed_frames=task.completed_frames,
-            progress_percentage=task.progress_percentage,
-            is_deleted=task.is_deleted,
-            p_date=task.p_date,
-            celery_task_id=task.celery_task_id,
-            error_message=task.error_message,
-            created_at=task.created_at,
-            updated_at=task.updated_at
-        )
-        for task in tasks
-    ]
+    task_responses = [_task_row_to_response(row) for row in rows]
 
     return TaskListResponse(total=total, tasks=task_responses)
 
@@ -207,28 +186,15 @@ async def get_task_frames(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"无效的帧状态: {status}")
 
-    # 获取总数
-    total = await query.count()
-
-    # 分页查询
-    frames = await query.offset(offset).limit(limit).order_by("frame_number")
+    # 并发获取总数和分页数据（直接查询字典，跳过ORM实例构建）
+    # 帧记录由Worker创建，创建之前 total 为0、列表为空（任务的总帧数见任务详情的 total_frames）
+    total, rows = await asyncio.gather(
+        query.count(),
+        query.offset(offset).limit(limit).order_by("frame_number").values(*_FRAME_VALUE_FIELDS)
+    )
 
     # 转换为响应模型
-    frame_responses = [
-        FrameResponse(
-            id=frame.id,
-            task_id=frame.task_id,
-            frame_number=frame.frame_number,
-            status=frame.status.value,
-            output_path=frame.output_path,
-            oss_output_path=frame.oss_output_path,
-            render_time=frame.render_time,
-            error_message=frame.error_message,
-            created_at=frame.created_at,
-            updated_at=frame.updated_at
-        )
-        for frame in frames
-    ]
+    frame_responses = [_frame_row_to_response(row) for row in rows]
 
     return FrameListResponse(total=total, frames=frame_responses)
 
@@ -252,15 +218,18 @@ async def cancel_task(task_id: int):
     if task.celery_task_id:
         celery_app.control.revoke(task.celery_task_id, terminate=True, signal='SIGTERM')
 
-    # 更新任务状态
-    task.status = TaskStatus.CANCELLED
-    await task.save()
+    # 写入取消标记，正在渲染的Worker无需查询数据库即可感知
+    mark_task_cancelled(task_id)
 
-    # 更新未完成帧的状态
-    await RenderFrame.filter(
-        task_id=task_id,
-        status__in=[FrameStatus.PENDING, FrameStatus.RENDERING]
-    ).update(status=FrameStatus.FAILED, error_message="任务已取消")
+    # 并发更新任务状态和未完成帧的状态
+    task.status = TaskStatus.CANCELLED
+    await asyncio.gather(
+        task.save(update_fields=["status", "updated_at"]),
+        RenderFrame.filter(
+            task_id=task_id,
+            status__in=[FrameStatus.PENDING, FrameStatus.RENDERING]
+        ).update(status=FrameStatus.FAILED, error_message="任务已取消")
+    )
 
     return {"message": "任务已取消", "task_id": task_id}
 
@@ -1,8 +1,14 @@
 """Celery应用配置（Windows兼容）"""
+import logging
 from celery import Celery
 from kombu import Queue
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# 任务取消标记的保留时间（秒），覆盖任务的最长执行时间
+CANCEL_FLAG_TTL = 3600 * 24
+
 # 创建Celery应用实例
 celery_app = Celery(
     "render_service",
@@ -12,16 +18,24 @@ celery_app = Celery(
 
 # Celery配置
 celery_app.conf.update(
-    # 任务序列化
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    # 任务序列化（msgpack 比 JSON 更紧凑、编解码更快；仍接受 JSON，兼容升级前已入队的消息）
+    task_serializer="msgpack",
+    accept_content=["msgpack", "json"],
+    result_serializer="msgpack",
+    result_accept_content=["msgpack", "json"],
+    event_serializer="msgpack",
     timezone="Asia/Shanghai",
     enable_utc=True,
 
     # 任务结果配置
     result_expires=3600,  # 结果保留1小时
 
+    # Broker配置
+    broker_transport_options={
+        # 未确认任务的重新投递超时，必须大于任务硬限制，否则acks_late的长渲染会被重复投递
+        "visibility_timeout": 3600 * 25,
+    },
+
     # 优先级队列配置
     task_default_priority=5,
     task_queue_max_priority=10,
@@ -33,7 +47,8 @@ celery_app.conf.update(
         Queue("low_priority", routing_key="low", priority=1),
     ),
 
-    # 任务路由
+    # 任务路由（未显式路由的任务，如帧子任务和重试任务，进入默认队列）
+    task_default_queue="default",
     task_routes={
         "app.celery_app.tasks.render_task": {
             "queue": "default",
@@ -46,7 +61,8 @@ celery_app.conf.update(
 
     # Worker配置
     worker_prefetch_multiplier=1,  # 每次只取一个任务，确保优先级生效
-    worker_max_tasks_per_child=50,  # 每个worker子进程最多执行50个任务后重启
+    worker_max_tasks_per_child=500,  # 每个worker子进程最多执行500个任务后重启（分摊事件循环和连接池的初始化）
+    worker_send_task_events=False,  # 不发送任务事件，减少broker写入
 
     # 任务执行时间限制
     task_time_limit=3600 * 24,  # 硬限制：24小时
@@ -55,3 +71,33 @@ celery_app.conf.update(
 
 # 自动发现任务
 celery_app.autodiscover_tasks(["app.celery_app"])
+
+
+def _cancel_flag_key(task_id: int) -> str:
+    """任务取消标记在Redis中的键名"""
+    return f"render_service:cancel:{task_id}"
+
+
+def mark_task_cancelled(task_id: int) -> None:
+    """
+    在Redis（Celery结果后端）中写入任务取消标记，供Worker在渲染循环中快速检查
+
+    写入失败时只记录日志，Worker仍会定期从数据库读取任务状态
+    """
+    try:
+        celery_app.backend.client.setex(_cancel_flag_key(task_id), CANCEL_FLAG_TTL, "1")
+    except Exception as e:
+        logger.warning(f"写入任务 {task_id} 的取消标记失败: {e}")
+
+
+def is_task_cancelled(task_id: int) -> bool:
+    """
+    检查Redis中是否存在任务取消标记
+
+    读取失败时返回False，由调用方回退到数据库检查
+    """
+    try:
+        return bool(celery_app.backend.client.exists(_cancel_flag_key(task_id)))
+    except Exception as e:
+        logger.warning(f"读取任务 {task_id} 的取消标记失败: {e}")
+        return False
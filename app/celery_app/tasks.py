@@ -1,39 +1,148 @@
 """Celery异步任务定义"""
 import asyncio
+import functools
 import logging
 import time
 import threading
 from pathlib import Path
-from celery import Task
+from celery import Task, chord
+from celery.signals import worker_process_init, worker_process_shutdown
 from celery.exceptions import Ignore
-from app.celery_app.celery import celery_app
+from tortoise import Tortoise, timezone
+from tortoise.expressions import F
+from app.celery_app.celery import celery_app, is_task_cancelled
 from app.config import settings
-from app.services.oss_storage import OSSStorageService
+from app.models.task import RenderTask, TaskStatus
+from app.models.frame import RenderFrame, FrameStatus, create_frames
+from app.services.file_preparation import FilePreparationService, LOGS_DIR_NAME
+from app.services.oss_storage import get_oss_service
+from app.services.renderer import get_renderer
 
 logger = logging.getLogger(__name__)
 
+# 安装了 uvloop 时（Linux/macOS，uvicorn[standard] 会一并安装）使用基于 libuv 的事件循环，
+# Windows 上没有 uvloop，保持默认事件循环
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
+# 渲染循环中每帧检查Redis取消标记，每隔多少帧或多少秒（取先到者）再从数据库确认一次任务状态
+CANCEL_CHECK_INTERVAL = 8
+CANCEL_CHECK_SECONDS = 2.0
+
+# 任务结束时需要写回的字段（completed_frames 由原子自增维护，不能用内存中的旧值覆盖）
+TASK_RESULT_FIELDS = ["status", "error_message", "updated_at"]
+
+# 渲染循环中帧结果攒批写回：每隔多少帧或多少秒（取先到者）批量写一次数据库
+FRAME_FLUSH_BATCH = 8
+FRAME_FLUSH_INTERVAL = 10
+
+# 帧渲染结束后需要写回的字段
+FRAME_RESULT_FIELDS = [
+    "status", "output_path", "oss_output_path", "render_time",
+    "error_message", "stdout_path", "stderr_path", "updated_at"
+]
+
+# 主渲染任务（重新）执行时需要渲染的帧状态：Worker 丢失后重新投递时，上次停留在渲染中的帧也要重新渲染
+RESUMABLE_FRAME_STATUSES = [FrameStatus.PENDING, FrameStatus.RENDERING]
+
+# 主渲染任务中用到的任务字段
+RENDER_TASK_FIELDS = [
+    "id", "unionid", "oss_file_path", "file_path", "is_compressed", "render_engine",
+    "task_info", "status", "total_frames", "completed_frames", "celery_task_id", "error_message",
+    "updated_at"
+]
+
+
+class CancelledByUser(Exception):
+    """渲染过程中发现任务已被用户取消（取消接口已写入任务状态）"""
+
+
+# 每个Worker进程共用一个在后台线程中常驻运行的事件循环，Tortoise连接池绑定在该循环上
+_LOOP = None
+
+
+def init_database_loop() -> None:
+    """创建当前进程的常驻事件循环并初始化数据库连接"""
+    global _LOOP
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="db-event-loop", daemon=True).start()
+    asyncio.run_coroutine_threadsafe(
+        Tortoise.init(
+            db_url=settings.tortoise_db_url,
+            modules={"models": ["app.models.task", "app.models.frame"]}
+        ),
+        loop
+    ).result()
+    _LOOP = loop
+
+
+@worker_process_init.connect
+def on_worker_process_init(**kwargs):
+    """prefork 子进程启动时初始化一次（线程不会被fork复制，因此不能在父进程中初始化）"""
+    settings.ensure_dirs()
+    init_database_loop()
+
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(**kwargs):
+    """Worker进程退出前关闭数据库连接"""
+    if _LOOP is not None:
+        asyncio.run_coroutine_threadsafe(Tortoise.close_connections(), _LOOP).result(timeout=10)
+
 
 class DatabaseTask(Task):
     """支持数据库操作的任务基类"""
-    _db_initialized = False
-    _init_lock = threading.Lock()  # 线程锁，确保数据库初始化的线程安全
 
     def before_start(self, task_id, args, kwargs):
-        """任务开始前初始化数据库连接"""
-        # 使用双重检查锁定模式（Double-Checked Locking）
-        if not self._db_initialized:
-            with self._init_lock:
-                # 再次检查，避免重复初始化
-                if not self._db_initialized:
-                    from tortoise import Tortoise
-                    loop = asyncio.get_event_loop()
-                    loop.run_until_complete(
-                        Tortoise.init(
-                            db_url=settings.database_url,
-                            modules={"models": ["app.models.task", "app.models.frame"]}
-                        )
-                    )
-                    self._db_initialized = True
+        """
+        --pool=solo 时不会触发 worker_process_init，在首个任务开始前初始化
+
+        solo 池在单线程中依次执行任务，这里不需要加锁
+        """
+        if _LOOP is None:
+            settings.ensure_dirs()
+            init_database_loop()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def get_file_prep():
+        """获取进程内共享的文件准备服务（复用其中的OSS客户端）"""
+        return FilePreparationService()
+
+    def run_coro(self, coro):
+        """
+        在常驻事件循环中执行协程并等待结果
+
+        注意：不能命名为 run，Celery 的 Task.run 是任务函数本身
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, _LOOP)
+        try:
+            return future.result()
+        except BaseException:
+            # 等待被中断（软超时、Worker退出信号等）时取消协程，避免它在后台继续运行到下一个任务
+            future.cancel()
+            raise
+
+
+def frame_log_paths(task, frame_number: int) -> tuple[Path, Path]:
+    """
+    获取帧渲染日志的文件路径（{workspace_dir}/logs/ 下，日志目录在准备工程文件时创建，渲染器执行命令前也会确保存在）
+
+    Args:
+        task: 渲染任务（task_info 中需要有 workspace_dir）
+        frame_number: 帧序号
+
+    Returns:
+        (stdout日志路径, stderr日志路径)
+    """
+    log_dir = Path(task.task_info.get("workspace_dir")) / LOGS_DIR_NAME
+    return (
+        log_dir / f"frame_{frame_number}.stdout.log",
+        log_dir / f"frame_{frame_number}.stderr.log",
+    )
 
 
 def upload_frame_to_oss(unionid: str, task_id: int, frame_number: int, local_output_path: Path) -> str:
@@ -53,8 +162,8 @@ def upload_frame_to_oss(unionid: str, task_id: int, frame_number: int, local_out
         Exception: 上传失败时抛出异常
     """
     try:
-        # 初始化OSS服务
-        oss_service = OSSStorageService()
+        # 进程内共享的OSS服务（复用HTTP连接）
+        oss_service = get_oss_service()
 
         # 构建OSS路径：renders/{unionid}/{task_id}/{frame_number}/{original_filename}
         original_filename = local_output_path.name
@@ -79,6 +188,213 @@ def upload_frame_to_oss(unionid: str, task_id: int, frame_number: int, local_out
         raise
 
 
+def _render_frame(self, task, frame, renderer, celery_task_id: str = None) -> bool:
+    """
+    渲染单帧并上传结果，把结果写入帧对象（不保存到数据库）
+
+    渲染失败时将帧标记为失败并记录错误，不抛出异常，以便继续渲染其他帧。
+    帧记录和任务进度由调用方通过 _flush_frame_results 批量写回。
+    函数内只有阻塞操作，在协程中调用时需通过 asyncio.to_thread 放到线程池执行。
+
+    Args:
+        self: 当前Celery任务（DatabaseTask实例）
+        task: 渲染任务
+        frame: 渲染帧
+        renderer: 渲染器实例
+        celery_task_id: 上报进度的Celery任务ID，在线程池中调用时必须传入（self.request 是线程局部的）
+
+    Returns:
+        是否渲染成功
+    """
+    try:
+        # 失败时同样需要日志路径用于排查，先写入帧对象
+        stdout_path, stderr_path = frame_log_paths(task, frame.frame_number)
+        frame.stdout_path = str(stdout_path)
+        frame.stderr_path = str(stderr_path)
+
+        # 执行渲染
+        start_time = time.perf_counter()
+        output_path, _, _ = renderer.render_frame(
+            project_file=task.task_info.get("project_file"),
+            frame_number=frame.frame_number,
+            output_dir=Path(task.task_info.get("renders_dir")),
+            stdout_path=stdout_path,
+            stderr_path=stderr_path,
+            engine_conf=task.task_info
+        )
+        render_time = time.perf_counter() - start_time
+
+        _complete_frame(task, frame, Path(output_path), render_time)
+        return True
+
+    except Exception as e:
+        # 记录错误但继续渲染其他帧
+        _mark_frame_failed(self, frame, e, celery_task_id)
+        return False
+
+
+def _render_frame_batch(self, task, frames: list, renderer, celery_task_id: str = None) -> int:
+    """
+    一次启动渲染器渲染一组连续帧，逐帧上传结果并写入帧对象（不保存到数据库）
+
+    与 _render_frame 相同：失败的帧标记为失败，不抛出异常；需要在线程池中执行。
+    一组帧共用一份日志（以第一帧命名），渲染耗时按帧数平均。
+
+    Args:
+        self: 当前Celery任务（DatabaseTask实例）
+        task: 渲染任务
+        frames: 帧序号连续的一组渲染帧
+        renderer: 渲染器实例（supports_batch 为True）
+        celery_task_id: 上报进度的Celery任务ID
+
+    Returns:
+        渲染成功的帧数
+    """
+    stdout_path, stderr_path = frame_log_paths(task, frames[0].frame_number)
+    for frame in frames:
+        frame.stdout_path = str(stdout_path)
+        frame.stderr_path = str(stderr_path)
+
+    try:
+        start_time = time.perf_counter()
+        outputs = renderer.render_frames(
+            project_file=task.task_info.get("project_file"),
+            frame_numbers=[frame.frame_number for frame in frames],
+            output_dir=Path(task.task_info.get("renders_dir")),
+            stdout_path=stdout_path,
+            stderr_path=stderr_path,
+            engine_conf=task.task_info
+        )
+        render_time = (time.perf_counter() - start_time) / len(frames)
+    except Exception as e:
+        for frame in frames:
+            _mark_frame_failed(self, frame, e, celery_task_id)
+        return 0
+
+    completed = 0
+    for frame in frames:
+        output_path = outputs.get(frame.frame_number)
+        if output_path is None:
+            _mark_frame_failed(
+                self, frame, RuntimeError(f"未找到渲染输出文件，帧号: {frame.frame_number}"), celery_task_id
+            )
+            continue
+        _complete_frame(task, frame, output_path, render_time)
+        completed += 1
+    return completed
+
+
+def _complete_frame(task, frame, output_path: Path, render_time: float) -> None:
+    """
+    上传渲染结果，并把帧标记为已完成（上传失败不影响帧状态）
+
+    Args:
+        task: 渲染任务
+        frame: 渲染帧
+        output_path: 渲染结果文件路径
+        render_time: 渲染耗时（秒）
+    """
+    # 上传渲染结果到OSS
+    try:
+        oss_path = upload_frame_to_oss(
+            unionid=task.unionid,
+            task_id=task.id,
+            frame_number=frame.frame_number,
+            local_output_path=output_path
+        )
+    except Exception as oss_error:
+        logger.warning(f"上传帧 {frame.frame_number} 到OSS失败: {str(oss_error)}，但渲染已完成")
+        oss_path = None
+
+    # 更新帧信息
+    frame.status = FrameStatus.COMPLETED
+    frame.output_path = str(output_path)
+    frame.oss_output_path = oss_path
+    frame.render_time = render_time
+
+
+def _mark_frame_failed(self, frame, error: Exception, celery_task_id: str = None) -> None:
+    """
+    把帧标记为失败，并上报Celery进度
+
+    Args:
+        self: 当前Celery任务（DatabaseTask实例）
+        frame: 渲染帧
+        error: 失败原因
+        celery_task_id: 上报进度的Celery任务ID
+    """
+    frame.status = FrameStatus.FAILED
+    frame.error_message = str(error)
+
+    self.update_state(
+        task_id=celery_task_id,
+        state="PROGRESS",
+        meta={
+            "frame": frame.frame_number,
+            "status": "failed",
+            "error": str(error)
+        }
+    )
+
+
+def _group_frames(frames: list, batch_size: int) -> list[list]:
+    """
+    把帧按序号连续、每组不超过 batch_size 帧分组（帧已按序号排序）
+
+    Args:
+        frames: 渲染帧列表
+        batch_size: 每组最多帧数
+
+    Returns:
+        分组后的帧列表
+    """
+    groups = []
+    for frame in frames:
+        if (groups and len(groups[-1]) < batch_size
+                and frame.frame_number == groups[-1][-1].frame_number + 1):
+            groups[-1].append(frame)
+        else:
+            groups.append([frame])
+    return groups
+
+
+async def _flush_frame_results(task_id: int, frames: list) -> None:
+    """
+    批量写回已渲染帧的结果，并按其中成功的帧数原子自增任务进度
+
+    Args:
+        task_id: 渲染任务ID
+        frames: 已渲染（成功或失败）的帧
+    """
+    if not frames:
+        return
+
+    # bulk_update 不会触发 auto_now，需要手动设置更新时间
+    now = timezone.now()
+    for frame in frames:
+        frame.updated_at = now
+    updates = [RenderFrame.bulk_update(frames, fields=FRAME_RESULT_FIELDS)]
+
+    completed = sum(1 for frame in frames if frame.status == FrameStatus.COMPLETED)
+    if completed:
+        updates.append(
+            RenderTask.filter(id=task_id).update(completed_frames=F("completed_frames") + completed)
+        )
+    await asyncio.gather(*updates)
+
+
+def _apply_final_status(task, completed_count: int) -> None:
+    """根据已完成帧数设置任务的最终状态"""
+
+    if completed_count == task.total_frames:
+        task.status = TaskStatus.COMPLETED
+    elif completed_count > 0:
+        task.status = TaskStatus.COMPLETED  # 部分完成也算完成
+    else:
+        task.status = TaskStatus.FAILED
+        task.error_message = "所有帧渲染失败"
+
+
 @celery_app.task(
     bind=True,
     base=DatabaseTask,
@@ -92,35 +408,48 @@ def render_task(self, task_id: int):
     Args:
         task_id: 渲染任务ID
     """
-    from app.models.task import RenderTask, TaskStatus
-    from app.models.frame import RenderFrame, FrameStatus
-    from app.services.renderer import get_renderer
+    # 整个任务体作为一个协程提交到常驻事件循环，而不是每次数据库操作都跨线程提交一次
+    # self.request 是线程局部的，需要在当前线程中取出Celery任务ID再传给协程
+    return self.run_coro(_render_task_async(self, task_id, self.request.id))
 
-    loop = asyncio.get_event_loop()
 
-    # 获取任务信息
-    task = loop.run_until_complete(
-        RenderTask.get(id=task_id).prefetch_related("frames")
-    )
+async def _render_task_async(self, task_id: int, celery_task_id: str):
+    """
+    主渲染任务的协程实现
 
-    # 检查任务是否被取消
-    if task.status == TaskStatus.CANCELLED:
+    文件准备、渲染、上传等阻塞操作通过 asyncio.to_thread 在线程池中执行，不阻塞事件循环
+
+    Args:
+        self: 当前Celery任务（DatabaseTask实例）
+        task_id: 渲染任务ID
+        celery_task_id: 当前Celery任务ID
+    """
+    # 未取消的任务更新为运行中：一条UPDATE同时完成取消检查和状态写入
+    updated = await RenderTask.filter(id=task_id, status__not=TaskStatus.CANCELLED).update(
+        status=TaskStatus.RUNNING,
+        celery_task_id=celery_task_id,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        # 任务已被取消（或已被删除）
         raise Ignore()
 
-    # 更新任务状态为运行中
-    task.status = TaskStatus.RUNNING
-    task.celery_task_id = self.request.id
-    loop.run_until_complete(task.save())
+    # 获取任务信息（只加载渲染用到的字段；部分加载的模型保存时必须指定 update_fields）
+    task = await RenderTask.get(id=task_id).only(*RENDER_TASK_FIELDS)
+
+    # 首次执行时创建帧记录（创建任务接口只写入任务记录，帧记录在Worker中批量写入）
+    if await RenderFrame.filter(task_id=task_id).count() == 0:
+        await create_frames(task_id, task.total_frames)
 
-    # 初始化文件准备服务（在try块外部，确保在所有分支中都可用）
-    from app.services.file_preparation import FilePreparationService
-    file_prep_service = FilePreparationService()
+    # 获取文件准备服务（在try块外部，确保在所有分支中都可用）
+    file_prep_service = self.get_file_prep()
 
     try:
         # 1. 准备工程文件（从OSS下载或使用本地文件）
 
         try:
-            project_file, workspace_dir, renders_dir = file_prep_service.prepare_project_files(
+            project_file, workspace_dir, renders_dir = await asyncio.to_thread(
+                file_prep_service.prepare_project_files,
                 unionid=task.unionid,
                 task_id=task.id,
                 oss_file_path=task.oss_file_path,
@@ -134,118 +463,140 @@ def render_task(self, task_id: int):
             task.task_info["project_file"] = str(project_file)
             task.task_info["workspace_dir"] = str(workspace_dir)
             task.task_info["renders_dir"] = str(renders_dir)
-            loop.run_until_complete(task.save())
+            await task.save(update_fields=["task_info", "updated_at"])
 
         except Exception as e:
             # 文件准备失败
             task.status = TaskStatus.FAILED
             task.error_message = f"文件准备失败: {str(e)}"
-            loop.run_until_complete(task.save())
+            await task.save(update_fields=TASK_RESULT_FIELDS)
             raise Ignore()
 
         # 2. 获取渲染引擎
         renderer = get_renderer(task.render_engine)
 
+        # 按帧拆分为独立子任务，由整个Worker池并行渲染，完成后由回调汇总任务状态
+        if settings.render_fan_out:
+            frame_numbers = await (
+                RenderFrame.filter(task_id=task_id, status__in=RESUMABLE_FRAME_STATUSES)
+                .values_list("frame_number", flat=True)
+            )
+            await asyncio.to_thread(
+                chord(
+                    render_single_frame.si(task_id, frame_number) for frame_number in frame_numbers
+                ),
+                finalize_render_task.si(task_id)
+            )
+            logger.info(f"任务 {task_id} 已拆分为 {len(frame_numbers)} 个帧子任务")
+            return
+
         # 3. 获取所有待渲染的帧
-        frames = loop.run_until_complete(
-            RenderFrame.filter(task_id=task_id, status=FrameStatus.PENDING).all()
+        frames = await (
+            RenderFrame.filter(task_id=task_id, status__in=RESUMABLE_FRAME_STATUSES)
+            .only("id", "frame_number", *FRAME_RESULT_FIELDS)
         )
 
-        # 逐帧渲染
-        for frame in frames:
-            logger.info(f'任务 {task_id}, Frame {frame.id} Start Run' )
-            # 再次检查是否被取消
-            task = loop.run_until_complete(RenderTask.get(id=task_id))
-            if task.status == TaskStatus.CANCELLED:
-                raise Ignore()
-
-            # 更新帧状态为渲染中
-            frame.status = FrameStatus.RENDERING
-            loop.run_until_complete(frame.save())
-
-            try:
-                # 执行渲染
-                start_time = time.time()
-                output_path, stdout, stderr = renderer.render_frame(
-                    project_file=task.task_info.get("project_file"),
-                    frame_number=frame.frame_number,
-                    output_dir=Path(task.task_info.get("renders_dir")),
-                    engine_conf=task.task_info
-                )
-                render_time = time.time() - start_time
-
-                # 上传渲染结果到OSS
+        # 渲染器支持时，连续的若干帧一次启动渲染器渲染（每组为一个渲染单元）
+        batch_size = settings.render_batch_size if renderer.supports_batch else 1
+        units = _group_frames(frames, max(batch_size, 1))
+
+        # 最多 render_parallelism 个渲染单元同时渲染，帧结果攒批写回（每 FRAME_FLUSH_BATCH 帧或每 FRAME_FLUSH_INTERVAL 秒写一次）
+        # 配置为 0 或负数时按 1 处理，否则 Semaphore(0) 会让所有渲染单元永远等待
+        semaphore = asyncio.Semaphore(max(settings.render_parallelism, 1))
+        stop = asyncio.Event()  # 取消或出错后不再开始新的帧，正在渲染的帧继续完成并写回
+        pending_results = []
+        # 已批量标记为渲染中的帧ID，以及其中真正开始渲染的帧ID（结束时把未开始的帧改回待渲染）
+        marked_ids = set()
+        started_ids = set()
+        last_flush = last_check = time.monotonic()
+        # 已完成帧数在本地累计（任务被重新投递时从上次已完成的帧数开始），不再在结束时COUNT查询
+        completed_count = task.completed_frames
+
+        async def render_one(index: int, unit: list) -> None:
+            nonlocal pending_results, last_flush, last_check, completed_count
+
+            async with semaphore:
+                if stop.is_set():
+                    return
                 try:
-                    oss_path = upload_frame_to_oss(
-                        unionid=task.unionid,
-                        task_id=task.id,
-                        frame_number=frame.frame_number,
-                        local_output_path=Path(output_path)
-                    )
-                except Exception as oss_error:
-                    logger.warning(f"上传帧 {frame.frame_number} 到OSS失败: {str(oss_error)}，但渲染已完成")
-                    oss_path = None
-
-                # 更新帧信息
-                frame.status = FrameStatus.COMPLETED
-                frame.output_path = str(output_path)
-                frame.oss_output_path = oss_path
-                frame.render_time = render_time
-                frame.stdout = stdout
-                frame.stderr = stderr
-                loop.run_until_complete(frame.save())
-
-                # 更新任务进度
-                task.completed_frames += 1
-                loop.run_until_complete(task.save())
-
-            except Exception as e:
-                # 帧渲染失败
-                frame.status = FrameStatus.FAILED
-                frame.error_message = str(e)
-                # 尝试保存渲染日志（如果有的话）
-                # 注意：异常时可能没有日志，但也可能是在后续步骤失败
-                loop.run_until_complete(frame.save())
-
-                # 记录错误但继续渲染其他帧
-                self.update_state(
-                    state="PROGRESS",
-                    meta={
-                        "frame": frame.frame_number,
-                        "status": "failed",
-                        "error": str(e)
-                    }
+                    logger.info(f'任务 {task_id}, Frame {unit[0].id} Start Run' )
+                    # 检查是否被取消：每帧检查Redis标记，每隔若干帧或若干秒再查询数据库兜底（只查询status字段）
+                    # Redis客户端是同步的，放到线程池中执行，Redis卡顿时不阻塞事件循环上其他帧的写回
+                    if await asyncio.to_thread(is_task_cancelled, task_id):
+                        raise CancelledByUser()
+                    now = time.monotonic()
+                    if index % CANCEL_CHECK_INTERVAL == 0 or now - last_check > CANCEL_CHECK_SECONDS:
+                        last_check = now
+                        status = await RenderTask.filter(id=task_id).first().values_list("status", flat=True)
+                        if status == TaskStatus.CANCELLED:
+                            raise CancelledByUser()
+
+                    # 每组帧开始时用一条UPDATE标记为渲染中
+                    if index % FRAME_FLUSH_BATCH == 0:
+                        group_ids = [f.id for group in units[index:index + FRAME_FLUSH_BATCH] for f in group]
+                        marked_ids.update(group_ids)
+                        await RenderFrame.filter(id__in=group_ids).update(status=FrameStatus.RENDERING)
+
+                    started_ids.update(f.id for f in unit)
+                    if len(unit) == 1:
+                        if await asyncio.to_thread(_render_frame, self, task, unit[0], renderer, celery_task_id):
+                            completed_count += 1
+                    else:
+                        completed_count += await asyncio.to_thread(
+                            _render_frame_batch, self, task, unit, renderer, celery_task_id
+                        )
+                    pending_results.extend(unit)
+
+                    if (len(pending_results) >= FRAME_FLUSH_BATCH
+                            or time.monotonic() - last_flush >= FRAME_FLUSH_INTERVAL):
+                        # 先换出待写回列表，写回期间其他帧完成时追加到新列表
+                        batch, pending_results = pending_results, []
+                        last_flush = time.monotonic()
+                        await _flush_frame_results(task_id, batch)
+                except BaseException:
+                    stop.set()
+                    raise
+
+        try:
+            # 等待所有帧结束后再抛出第一个异常，避免在其他帧仍在渲染时提前返回
+            results = await asyncio.gather(
+                *(render_one(index, unit) for index, unit in enumerate(units)),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+        finally:
+            # 取消或异常时也写回已经渲染完成的帧；已标记为渲染中但没有开始的帧改回待渲染
+            never_started = list(marked_ids - started_ids)
+            updates = [_flush_frame_results(task_id, pending_results)]
+            if never_started:
+                updates.append(
+                    RenderFrame.filter(id__in=never_started, status=FrameStatus.RENDERING)
+                    .update(status=FrameStatus.PENDING)
                 )
+            await asyncio.gather(*updates)
 
         # 检查是否所有帧都完成
-        completed_count = loop.run_until_complete(
-            RenderFrame.filter(task_id=task_id, status=FrameStatus.COMPLETED).count()
-        )
-
-        if completed_count == task.total_frames:
-            task.status = TaskStatus.COMPLETED
-        elif completed_count > 0:
-            task.status = TaskStatus.COMPLETED  # 部分完成也算完成
-        else:
-            task.status = TaskStatus.FAILED
-            task.error_message = "所有帧渲染失败"
-
-        loop.run_until_complete(task.save())
+        _apply_final_status(task, completed_count)
+        await task.save(update_fields=TASK_RESULT_FIELDS)
 
         logger.info(f"任务 {task_id} 完成，工作空间保留在: {task.task_info.get('workspace_dir')}")
 
-    except Ignore:
-        # 任务被取消
-        task.status = TaskStatus.CANCELLED
-        loop.run_until_complete(task.save())
+    except CancelledByUser:
+        # 任务被取消：状态由取消接口写入，这里不再重复写库
         logger.info(f"任务 {task_id} 已取消，工作空间保留在: {task.task_info.get('workspace_dir')}")
+        raise Ignore()
+
+    except Ignore:
+        # 文件准备失败等分支已自行写入最终状态
         raise
 
     except Exception as e:
         # 任务失败
         task.status = TaskStatus.FAILED
         task.error_message = str(e)
-        loop.run_until_complete(task.save())
+        await task.save(update_fields=TASK_RESULT_FIELDS)
         logger.error(f"任务 {task_id} 失败，工作空间保留在: {task.task_info.get('workspace_dir')}")
 
         # 重新抛出原始异常，让Celery记录错误
@@ -255,7 +606,86 @@ def render_task(self, task_id: int):
 @celery_app.task(
     bind=True,
     base=DatabaseTask,
-    name="app.celery_app.tasks.retry_render_frame"
+    name="app.celery_app.tasks.render_single_frame",
+    acks_late=True
+)
+def render_single_frame(self, task_id: int, frame_number: int):
+    """
+    渲染单帧的子任务（render_fan_out 开启时由 render_task 拆分）
+
+    子任务出错时不抛出异常：chord 中任一子任务失败都不会调用 finalize_render_task，任务会一直停留在运行中。
+    _render_frame 之外的错误（数据库错误、帧不存在等）记录到帧上后正常返回。
+
+    Args:
+        task_id: 渲染任务ID
+        frame_number: 帧号
+    """
+    try:
+        if is_task_cancelled(task_id):
+            raise Ignore()
+
+        task = self.run_coro(RenderTask.get(id=task_id))
+        if task.status == TaskStatus.CANCELLED:
+            raise Ignore()
+
+        frame = self.run_coro(RenderFrame.get(task_id=task_id, frame_number=frame_number))
+        logger.info(f'任务 {task_id}, Frame {frame.id} Start Run')
+
+        frame.status = FrameStatus.RENDERING
+        self.run_coro(frame.save(update_fields=["status", "updated_at"]))
+
+        renderer = get_renderer(task.render_engine)
+        _render_frame(self, task, frame, renderer)
+        self.run_coro(_flush_frame_results(task_id, [frame]))
+
+    except Ignore:
+        raise
+
+    except Exception as e:
+        logger.error(f"任务 {task_id} 帧 {frame_number} 子任务出错: {str(e)}")
+        try:
+            self.run_coro(
+                RenderFrame.filter(task_id=task_id, frame_number=frame_number).update(
+                    status=FrameStatus.FAILED,
+                    error_message=str(e),
+                    updated_at=timezone.now()
+                )
+            )
+        except Exception as db_error:
+            logger.error(f"标记帧 {frame_number} 失败时出错: {str(db_error)}")
+
+
+@celery_app.task(
+    bind=True,
+    base=DatabaseTask,
+    name="app.celery_app.tasks.finalize_render_task",
+    ignore_result=True
+)
+def finalize_render_task(self, task_id: int):
+    """
+    所有帧子任务完成后汇总任务状态
+
+    Args:
+        task_id: 渲染任务ID
+    """
+    task = self.run_coro(RenderTask.get(id=task_id))
+    if task.status == TaskStatus.CANCELLED:
+        return
+
+    completed_count = self.run_coro(
+        RenderFrame.filter(task_id=task_id, status=FrameStatus.COMPLETED).count()
+    )
+    _apply_final_status(task, completed_count)
+    self.run_coro(task.save(update_fields=TASK_RESULT_FIELDS))
+
+    logger.info(f"任务 {task_id} 完成，工作空间保留在: {task.task_info.get('workspace_dir')}")
+
+
+@celery_app.task(
+    bind=True,
+    base=DatabaseTask,
+    name="app.celery_app.tasks.retry_render_frame",
+    ignore_result=True  # 结果不会被读取，跳过结果后端写入
 )
 def retry_render_frame(self, task_id: int, frame_number: int):
     """
@@ -265,15 +695,9 @@ def retry_render_frame(self, task_id: int, frame_number: int):
         task_id: 任务ID
         frame_number: 帧号
     """
-    from app.models.task import RenderTask, TaskStatus
-    from app.models.frame import RenderFrame, FrameStatus
-    from app.services.renderer import get_renderer
-
-    loop = asyncio.get_event_loop()
-
     try:
         # 获取任务信息
-        task = loop.run_until_complete(RenderTask.get(id=task_id))
+        task = self.run_coro(RenderTask.get(id=task_id))
 
         # 检查任务状态
         if task.status == TaskStatus.CANCELLED:
@@ -281,14 +705,14 @@ def retry_render_frame(self, task_id: int, frame_number: int):
             return
 
         # 获取帧信息
-        frame = loop.run_until_complete(
+        frame = self.run_coro(
             RenderFrame.get(task_id=task_id, frame_number=frame_number)
         )
 
         # 更新帧状态为渲染中
         frame.status = FrameStatus.RENDERING
         frame.error_message = None
-        loop.run_until_complete(frame.save())
+        self.run_coro(frame.save())
 
         logger.info(f"开始重试渲染：任务 {task_id}，帧 {frame_number}")
 
@@ -296,14 +720,17 @@ def retry_render_frame(self, task_id: int, frame_number: int):
         renderer = get_renderer(task.render_engine)
 
         # 执行渲染
-        start_time = time.time()
-        output_path, stdout, stderr = renderer.render_frame(
+        stdout_path, stderr_path = frame_log_paths(task, frame.frame_number)
+        start_time = time.perf_counter()
+        output_path, _, _ = renderer.render_frame(
             project_file=task.task_info.get("project_file"),
             frame_number=frame.frame_number,
             output_dir=Path(task.task_info.get("renders_dir")),
+            stdout_path=stdout_path,
+            stderr_path=stderr_path,
             engine_conf=task.task_info
         )
-        render_time = time.time() - start_time
+        render_time = time.perf_counter() - start_time
 
         # 上传渲染结果到OSS
         try:
@@ -322,12 +749,12 @@ def retry_render_frame(self, task_id: int, frame_number: int):
         frame.output_path = str(output_path)
         frame.oss_output_path = oss_path
         frame.render_time = render_time
-        frame.stdout = stdout
-        frame.stderr = stderr
-        loop.run_until_complete(frame.save())
+        frame.stdout_path = str(stdout_path)
+        frame.stderr_path = str(stderr_path)
+        self.run_coro(frame.save())
 
         # 更新任务的已完成帧数
-        task.completed_frames = loop.run_until_complete(
+        task.completed_frames = self.run_coro(
             RenderFrame.filter(task_id=task_id, status=FrameStatus.COMPLETED).count()
         )
 
@@ -338,7 +765,7 @@ def retry_render_frame(self, task_id: int, frame_number: int):
             # 如果之前是失败状态，现在改为部分完成
             task.status = TaskStatus.COMPLETED
 
-        loop.run_until_complete(task.save())
+        self.run_coro(task.save())
 
         logger.info(f"成功重试渲染：任务 {task_id}，帧 {frame_number}")
 
@@ -346,12 +773,12 @@ def retry_render_frame(self, task_id: int, frame_number: int):
         # 渲染失败
         logger.error(f"重试渲染失败：任务 {task_id}，帧 {frame_number}，错误: {str(e)}")
 
-        frame = loop.run_until_complete(
+        frame = self.run_coro(
             RenderFrame.get(task_id=task_id, frame_number=frame_number)
         )
         frame.status = FrameStatus.FAILED
         frame.error_message = str(e)
-        loop.run_until_complete(frame.save())
+        self.run_coro(frame.save())
 
         # 不再自动重试，需要用户手动调用重试接口
         logger.error(f"渲染帧 {frame_number} 失败，请手动重试")
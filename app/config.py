@@ -1,13 +1,44 @@
 """应用配置管理"""
+import functools
+import os
+from dataclasses import dataclass, fields
 from pathlib import Path
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from urllib.parse import parse_qsl, urlencode
+from dotenv import load_dotenv
 
 
-class Settings(BaseSettings):
-    """应用配置类"""
+def _parse_env_value(name: str, raw: str, field_type: type):
+    """
+    把环境变量的字符串值转换为配置字段的类型
+
+    Raises:
+        ValueError: 值无法转换为字段类型
+    """
+    if field_type is bool:
+        value = raw.strip().lower()
+        if value in ("1", "true", "yes", "on"):
+            return True
+        if value in ("0", "false", "no", "off", ""):
+            return False
+        raise ValueError(f"配置项 {name.upper()} 不是有效的布尔值: {raw}")
+    if field_type is int:
+        try:
+            return int(raw)
+        except ValueError:
+            raise ValueError(f"配置项 {name.upper()} 不是有效的整数: {raw}")
+    if field_type is Path:
+        return Path(raw)
+    return raw
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """应用配置类（不可变，进程内只从环境变量构建一次）"""
 
     # 数据库配置
     database_url: str = "sqlite://db.sqlite3"
+    db_pool_minsize: int = 2  # 连接池最小连接数（MySQL/PostgreSQL）
+    db_pool_maxsize: int = 20  # 连接池最大连接数（MySQL/PostgreSQL）
 
     # Redis配置
     redis_host: str = "localhost"
@@ -22,6 +53,8 @@ class Settings(BaseSettings):
     # 文件存储配置
     workspace_root_dir: Path = Path("C:/workspace")  # 任务工作空间根目录
     renders_dir_name: str = "Renders"  # 渲染输出目录名称（系统统一配置）
+    local_file_hardlink: bool = False  # 本地工程文件以硬链接放入工作空间（需同一卷，且渲染期间源文件不会被修改）
+    oss_download_cache: bool = False  # 按ETag缓存OSS下载的文件（{workspace_root_dir}/.cache），相同文件不重复下载
 
     # 阿里云OSS配置
     oss_endpoint: str = "oss-cn-hangzhou.aliyuncs.com"  # OSS访问域名
@@ -33,21 +66,63 @@ class Settings(BaseSettings):
     maya_executable: Path = Path("C:/Program Files/Autodesk/Maya2022/bin/Render.exe")
     ue_executable: Path = Path("C:/Program Files/Epic Games/UE_5.3/Engine/Binaries/Win64/UnrealEditor-Cmd.exe")
 
+    # 渲染调度配置
+    render_fan_out: bool = False  # 按帧拆分为独立的Celery子任务并行渲染（需要多个Worker才有收益）
+    render_parallelism: int = 1  # 单个Worker中同时渲染的帧数（渲染器本身多线程/占用GPU，按机器配置调整）
+    render_batch_size: int = 1  # 每次启动渲染器连续渲染的帧数（目前仅Maya支持，分摊启动和加载场景的开销）
+
     # API配置
     api_host: str = "0.0.0.0"
     api_port: int = 8000
 
-    model_config = SettingsConfigDict(
-        env_file=".env",
-        env_file_encoding="utf-8",
-        case_sensitive=False
-    )
+    # 文件下载配置
+    use_x_accel: bool = False  # 由nginx通过X-Accel-Redirect直接发送文件（需配置internal location）
+    x_accel_prefix: str = "/internal/renders/"  # nginx中映射到工作空间根目录的internal location
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        从环境变量构建配置（字段名的大写形式，如 DATABASE_URL），未设置的字段使用默认值
+
+        Raises:
+            ValueError: 环境变量的值无法转换为字段类型
+        """
+        values = {}
+        for field in fields(cls):
+            raw = os.environ.get(field.name.upper())
+            if raw is not None:
+                values[field.name] = _parse_env_value(field.name, raw, field.type)
+        return cls(**values)
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # 确保必要的目录存在
+    def ensure_dirs(self) -> None:
+        """确保必要的目录存在（在API启动和Worker进程启动时各调用一次，导入配置时不访问文件系统）"""
         self.workspace_root_dir.mkdir(parents=True, exist_ok=True)
 
+    @property
+    def tortoise_db_url(self) -> str:
+        """
+        带连接池参数的数据库连接URL
+
+        MySQL/PostgreSQL 默认只有很小的连接池，这里补上 minsize/maxsize（URL中已指定的参数优先）；
+        SQLite 只有单个连接，原样返回
+        """
+        if self.database_url.startswith("sqlite"):
+            return self.database_url
+
+        base, _, query = self.database_url.partition("?")
+        params = dict(parse_qsl(query))
+        params.setdefault("minsize", str(self.db_pool_minsize))
+        params.setdefault("maxsize", str(self.db_pool_maxsize))
+        return f"{base}?{urlencode(params)}"
+
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """获取进程内唯一的配置实例（只解析一次环境变量和 .env 文件）"""
+    # 加载当前目录下的 .env 文件（已存在的环境变量优先）
+    load_dotenv(".env", encoding="utf-8")
+    return Settings.from_env()
+
 
 # 全局配置实例
-settings = Settings()
+settings = get_settings()
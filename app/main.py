@@ -9,7 +9,7 @@ from app.api import tasks, files
 
 # 数据库配置
 TORTOISE_ORM = {
-    "connections": {"default": settings.database_url},
+    "connections": {"default": settings.tortoise_db_url},
     "apps": {
         "models": {
             "models": ["app.models.task", "app.models.frame", "aerich.models"],
@@ -22,9 +22,11 @@ TORTOISE_ORM = {
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
+    settings.ensure_dirs()
+
     # 启动时初始化数据库
     await Tortoise.init(
-        db_url=settings.database_url,
+        db_url=settings.tortoise_db_url,
         modules={"models": ["app.models.task", "app.models.frame"]}
     )
     # 自动生成数据库表
@@ -1,7 +1,9 @@
 """渲染帧模型"""
+from datetime import date
 from enum import Enum
-from tortoise import fields
+from tortoise import fields, timezone
 from tortoise.models import Model
+from tortoise.transactions import in_transaction
 
 
 class FrameStatus(str, Enum):
@@ -30,9 +32,9 @@ class RenderFrame(Model):
     render_time = fields.FloatField(null=True)
     # 错误信息
     error_message = fields.TextField(null=True)
-    # 渲染日志
-    stdout = fields.TextField(null=True)
-    stderr = fields.TextField(null=True)
+    # 渲染日志文件路径（完整日志保存在任务工作空间的 logs 目录中）
+    stdout_path = fields.CharField(max_length=500, null=True)
+    stderr_path = fields.CharField(max_length=500, null=True)
     # 是否已删除（软删除）
     is_deleted = fields.BooleanField(default=False)
     # 分区日期（用于数据分区管理，自动获取创建日期）
@@ -45,6 +47,42 @@ class RenderFrame(Model):
         table = "render_frames"
         ordering = ["frame_number"]  # 按帧序号排序
         unique_together = (("task", "frame_number"),)  # 同一任务的帧序号唯一
+        indexes = (
+            ("task_id", "status"),  # 渲染循环按状态查询帧、统计已完成帧数
+            ("task_id", "is_deleted"),  # 帧列表接口过滤已删除记录
+        )
 
     def __str__(self):
         return f"RenderFrame({self.id}, task={self.task_id}, frame={self.frame_number}, {self.status})"
+
+
+async def create_frames(task_id: int, total_frames: int, batch_size: int = 1000) -> None:
+    """
+    为任务批量创建待渲染帧记录
+
+    使用 bulk_create 按批写入（每批一次数据库往返），字段值由 ORM 按数据库方言转换。
+    所有批次在同一个事务中写入：调用方通过“帧记录数为0”判断是否需要创建，
+    中途失败时不能留下只有一部分帧的任务。（同一任务的帧序号仍由唯一索引保证不重复）
+
+    Args:
+        task_id: 任务ID
+        total_frames: 总帧数（帧序号从1开始）
+        batch_size: 每批写入的行数
+    """
+    # 所有帧使用同一组时间戳，不为每个实例单独取时间
+    today = date.today()
+    now = timezone.now()
+    frames = [
+        RenderFrame(
+            task_id=task_id,
+            frame_number=frame_number,
+            status=FrameStatus.PENDING,
+            p_date=today,
+            created_at=now,
+            updated_at=now
+        )
+        for frame_number in range(1, total_frames + 1)
+    ]
+
+    async with in_transaction() as conn:
+        await RenderFrame.bulk_create(frames, batch_size=batch_size, using_db=conn)
@@ -59,6 +59,10 @@ class RenderTask(Model):
     class Meta:
         table = "render_tasks"
         ordering = ["-created_at"]  # 创建时间晚的在前
+        indexes = (
+            ("status", "p_date"),  # 按状态和日期筛选任务
+            ("unionid", "is_deleted"),  # 按用户查询未删除的任务
+        )
 
     def __str__(self):
         return f"RenderTask({self.id}, {self.render_engine}, {self.status})"
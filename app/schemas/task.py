@@ -14,6 +14,7 @@ class TaskCreate(BaseModel):
     render_engine: RenderEngine = Field(..., description="渲染引擎类型 (maya/ue)")
     task_info: dict = Field(default_factory=dict, description="任务信息，包含执行任务所需的所有配置 (例如: Maya的renderer类型、UE的分辨率等)")
     total_frames: int = Field(..., gt=0, description="总帧数")
+    priority: int = Field(default=5, ge=0, le=10, description="任务优先级 (0-10)，决定任务进入的队列")
 
     def model_post_init(self, __context):
         """验证必须提供 oss_file_path 或 file_path 其中之一"""
@@ -33,7 +34,8 @@ class TaskCreate(BaseModel):
                     "renderer": "arnold",
                     "quality": "high"
                 },
-                "total_frames": 100
+                "total_frames": 100,
+                "priority": 5
             }
         }
 
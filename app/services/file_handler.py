@@ -1,13 +1,68 @@
 """文件处理服务（解压、清理等）"""
-import gzip
+import os
+import queue
 import shutil
+import threading
 import zipfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+# 优先使用 ISA-L 加速的 gzip 实现（接口与标准库相同，解压速度约为2-3倍），未安装时使用标准库
+try:
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
 
 logger = logging.getLogger(__name__)
 
+# 解压时每次读写的块大小（默认64KB对大型场景文件的系统调用次数过多）
+COPY_BUFFER_SIZE = 1 << 20
+
+# gzip 解压流水线：解压线程每次产出4MB，最多缓存4块（约16MB）等待写入线程写盘
+PIPELINE_CHUNK_SIZE = 4 << 20
+PIPELINE_QUEUE_SIZE = 4
+
+# 使用 copy_file_range 复制文件时每次调用的最大字节数
+COPY_RANGE_CHUNK_SIZE = 4 << 20
+
+# zip 并行解压：成员数不少于该值时使用多线程（解压时会释放GIL），线程数不超过8
+ZIP_PARALLEL_MIN_ENTRIES = 8
+ZIP_EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+# 清理目录：文件数不少于该值时使用多线程删除
+RMTREE_PARALLEL_MIN_FILES = 64
+RMTREE_WORKERS = 8
+
+# Windows 文件名中不允许出现的字符（与 ZipFile.extract 一样替换为下划线）
+_WINDOWS_ILLEGAL_CHARS = str.maketrans(':<>|"?*', '_______')
+
+
+def _fadvise(fd: int, advice: str) -> None:
+    """
+    向内核提示文件的访问方式（posix_fadvise，Windows/macOS 上不做任何事）
+
+    Args:
+        fd: 文件描述符
+        advice: os 模块中的常量名，如 "POSIX_FADV_SEQUENTIAL"
+    """
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+        except OSError:
+            pass
+
+
+def _is_reparse_point(entry: os.DirEntry) -> bool:
+    """
+    判断目录项是否为Windows重解析点（目录联接等，is_dir 会把它当作普通目录）
+
+    删除时不能进入这类目录，否则会删掉联接指向的内容；其他平台始终返回False
+    """
+    attributes = getattr(entry.stat(follow_symlinks=False), "st_file_attributes", 0)
+    return bool(attributes & 0x400)  # FILE_ATTRIBUTE_REPARSE_POINT
+
 
 class FileHandlerService:
     """文件处理服务类"""
@@ -37,8 +92,7 @@ class FileHandlerService:
             ValueError: 不支持的压缩格式
             FileNotFoundError: 压缩文件不存在
         """
-        if not compressed_file.exists():
-            raise FileNotFoundError(f"压缩文件不存在: {compressed_file}")
+        # 不预先检查压缩文件是否存在（多一次stat），打开文件时会抛出 FileNotFoundError
 
         # 确保输出目录存在
         output_dir.mkdir(parents=True, exist_ok=True)
@@ -60,6 +114,13 @@ class FileHandlerService:
             else:
                 raise ValueError(f"不支持的压缩格式: {suffix}")
 
+        except FileNotFoundError as e:
+            if e.filename is not None and Path(e.filename) == compressed_file:
+                logger.error(f"压缩文件不存在: {compressed_file}")
+                raise FileNotFoundError(f"压缩文件不存在: {compressed_file}") from e
+            logger.error(f"解压文件时发生错误: {e}")
+            raise
+
         except Exception as e:
             logger.error(f"解压文件时发生错误: {e}")
             raise
@@ -88,18 +149,37 @@ class FileHandlerService:
 
         logger.info(f"解压 gzip 文件: {gz_file.name} -> {output_file.name}")
 
-        try:
-            with gzip.open(gz_file, 'rb') as f_in:
-                with open(output_file, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
+        # 压缩文件按1MB缓冲读取；提示内核顺序读取（加大预读），读完后压缩文件的页缓存不再需要
+        with open(gz_file, 'rb', buffering=COPY_BUFFER_SIZE) as raw_in:
+            _fadvise(raw_in.fileno(), "POSIX_FADV_SEQUENTIAL")
+            FileHandlerService.decompress_gzip_stream(raw_in, output_file)
+            _fadvise(raw_in.fileno(), "POSIX_FADV_DONTNEED")
 
-            logger.info(f"gzip 解压成功: {output_file}")
+        # 删除原压缩文件
+        if delete_after:
+            gz_file.unlink()
+            logger.info(f"已删除原压缩文件: {gz_file}")
 
-            # 删除原压缩文件
-            if delete_after:
-                gz_file.unlink()
-                logger.info(f"已删除原压缩文件: {gz_file}")
+        return output_file
+
+    @staticmethod
+    def decompress_gzip_stream(stream: BinaryIO, output_file: Path) -> Path:
+        """
+        从可读的字节流（本地文件或OSS下载流）解压gzip数据到文件
 
+        Args:
+            stream: gzip格式的字节流
+            output_file: 解压后的文件路径
+
+        Returns:
+            解压后的文件路径
+        """
+        try:
+            # 解压和写盘在两个线程中同时进行
+            with gzip.GzipFile(fileobj=stream, mode='rb') as f_in, open(output_file, 'wb') as f_out:
+                FileHandlerService._pipelined_copy(f_in, f_out)
+
+            logger.info(f"gzip 解压成功: {output_file}")
             return output_file
 
         except Exception as e:
@@ -109,6 +189,47 @@ class FileHandlerService:
                 output_file.unlink()
             raise
 
+    @staticmethod
+    def _pipelined_copy(f_in: BinaryIO, f_out: BinaryIO) -> None:
+        """
+        双缓冲复制：当前线程读取（解压），单独的写入线程写盘
+
+        zlib 解压和文件写入都会释放GIL，两者可以重叠执行；
+        有界队列限制了等待写入的数据量，写入失败时解压随即停止。
+
+        Args:
+            f_in: 读取端（例如 GzipFile）
+            f_out: 写入端
+        """
+        buffers: queue.Queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        write_failed = threading.Event()
+
+        def writer() -> None:
+            error = None
+            # 出错后继续取出队列中的数据（不再写入），避免读取线程阻塞在 put 上
+            while (chunk := buffers.get()) is not None:
+                if error is None:
+                    try:
+                        f_out.write(chunk)
+                    except BaseException as e:
+                        error = e
+                        write_failed.set()
+            if error is not None:
+                raise error
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            write_future = executor.submit(writer)
+            try:
+                while not write_failed.is_set():
+                    chunk = f_in.read(PIPELINE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    buffers.put(chunk)
+            finally:
+                buffers.put(None)
+            # 等待全部写入完成，并抛出写入线程中的异常
+            write_future.result()
+
     @staticmethod
     def _decompress_zip(
         zip_file: Path,
@@ -131,11 +252,28 @@ class FileHandlerService:
         try:
             with zipfile.ZipFile(zip_file, 'r') as zip_ref:
                 # 获取zip内的文件列表
-                file_list = zip_ref.namelist()
-                logger.info(f"zip 文件包含 {len(file_list)} 个文件")
-
-                # 解压所有文件
-                zip_ref.extractall(output_dir)
+                members = zip_ref.infolist()
+                logger.info(f"zip 文件包含 {len(members)} 个文件")
+
+                parallel = len(members) >= ZIP_PARALLEL_MIN_ENTRIES and ZIP_EXTRACT_WORKERS > 1
+                if not parallel:
+                    # 文件较少时直接串行解压
+                    for info in members:
+                        FileHandlerService._extract_zip_member(zip_ref, info, output_dir)
+
+            if parallel:
+                # 按大小从大到小轮流分配给各线程，使每个线程的解压量大致均衡
+                members.sort(key=lambda info: info.file_size, reverse=True)
+                groups = [
+                    [info.filename for info in members[i::ZIP_EXTRACT_WORKERS]]
+                    for i in range(ZIP_EXTRACT_WORKERS)
+                ]
+                with ThreadPoolExecutor(max_workers=ZIP_EXTRACT_WORKERS) as executor:
+                    # list() 等待全部完成，并抛出线程中的异常
+                    list(executor.map(
+                        lambda names: FileHandlerService._extract_zip_members(zip_file, output_dir, names),
+                        groups
+                    ))
 
             logger.info(f"zip 解压成功: {output_dir}")
 
@@ -150,6 +288,114 @@ class FileHandlerService:
             logger.error(f"解压 zip 文件失败: {e}")
             raise
 
+    @staticmethod
+    def _extract_zip_members(zip_file: Path, output_dir: Path, names: List[str]) -> None:
+        """
+        在独立的 ZipFile 句柄中解压一组成员（ZipFile 对象不能在多个线程间共享）
+
+        Args:
+            zip_file: .zip文件路径
+            output_dir: 输出目录
+            names: 要解压的成员名称
+        """
+        with zipfile.ZipFile(zip_file, 'r') as zip_ref:
+            for name in names:
+                FileHandlerService._extract_zip_member(zip_ref, zip_ref.getinfo(name), output_dir)
+
+    @staticmethod
+    def _extract_zip_member(zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo, output_dir: Path) -> None:
+        """
+        解压单个zip成员（替代 ZipFile.extract，按1MB分块解压和写入）
+
+        ZipFile.extract 使用 copyfileobj 的默认块大小，大文件的解压和写入调用次数过多。
+        成员路径的处理与 ZipFile.extract 相同：去除盘符、绝对路径和 .. 等路径段，
+        Windows 上替换文件名中的非法字符，保证只会写到输出目录之内。
+
+        Args:
+            zip_ref: 已打开的 ZipFile
+            info: 成员信息
+            output_dir: 输出目录
+        """
+        arcname = info.filename.replace('/', os.path.sep)
+        if os.path.altsep:
+            arcname = arcname.replace(os.path.altsep, os.path.sep)
+        arcname = os.path.splitdrive(arcname)[1]
+        parts = [part for part in arcname.split(os.path.sep) if part not in ('', os.path.curdir, os.path.pardir)]
+        if os.path.sep == '\\':
+            parts = [part.translate(_WINDOWS_ILLEGAL_CHARS).rstrip('.') for part in parts]
+            parts = [part for part in parts if part]
+        if not parts:
+            return
+
+        target = os.path.join(output_dir, *parts)
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+            return
+
+        # 多个线程可能同时创建同一个父目录，exist_ok 可以处理这种竞争
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with zip_ref.open(info) as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+    @staticmethod
+    def stage_file(src: Path, dest: Path, hardlink: bool = False) -> Path:
+        """
+        把文件放入工作空间（替代 shutil.copy2，不复制元数据）
+
+        优先级：
+        1. hardlink=True 时创建硬链接（同一卷上不复制任何数据，要求源文件在渲染期间不被修改）
+        2. Linux 上使用 os.copy_file_range（内核内复制，支持的文件系统上为写时复制的reflink）
+        3. shutil.copyfile
+
+        Args:
+            src: 源文件路径
+            dest: 目标文件路径
+            hardlink: 是否尝试使用硬链接
+
+        Returns:
+            目标文件路径
+        """
+        if hardlink:
+            try:
+                if dest.exists():
+                    dest.unlink()
+                os.link(src, dest)
+                logger.info(f"已创建硬链接: {src} -> {dest}")
+                return dest
+            except OSError as e:
+                # 跨卷、文件系统不支持等情况，回退为复制
+                logger.info(f"无法创建硬链接（{e}），改为复制文件")
+
+        if not FileHandlerService._copy_file_range(src, dest):
+            shutil.copyfile(src, dest)
+        return dest
+
+    @staticmethod
+    def _copy_file_range(src: Path, dest: Path) -> bool:
+        """
+        使用 os.copy_file_range 复制文件（仅Linux）
+
+        Returns:
+            是否复制成功；平台或文件系统不支持时返回False，由调用方回退到普通复制
+        """
+        if not hasattr(os, "copy_file_range"):
+            return False
+
+        try:
+            with open(src, 'rb') as f_src, open(dest, 'wb') as f_dest:
+                remaining = os.fstat(f_src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(
+                        f_src.fileno(), f_dest.fileno(), min(remaining, COPY_RANGE_CHUNK_SIZE)
+                    )
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            return remaining == 0
+        except OSError as e:
+            logger.debug(f"copy_file_range 不可用（{e}），改为普通复制")
+            return False
+
     @staticmethod
     def find_project_file(
         directory: Path,
@@ -167,16 +413,63 @@ class FileHandlerService:
         """
         logger.info(f"在目录中查找工程文件: {directory}, 扩展名: {extensions}")
 
-        for ext in extensions:
-            # 使用 glob 递归查找
-            files = list(directory.rglob(f"*{ext}"))
-            if files:
-                logger.info(f"找到工程文件: {files[0]}")
-                return files[0]
+        # 扩展名越靠前优先级越高；只遍历一次目录树，找到最高优先级的文件时立即返回
+        priorities = {ext.lower(): index for index, ext in enumerate(extensions)}
+        # str.endswith 接受元组，一次调用（C实现）判断所有扩展名，不匹配的文件不再做其他处理
+        suffixes = tuple(priorities)
+        # 扩展名都只有一段时（.ma/.mb/.uproject），匹配到的扩展名就是 splitext 的结果，直接查表得到优先级
+        single_segment = all(ext.count(".") == 1 for ext in suffixes)
+        best: Optional[Tuple[int, str]] = None
+
+        for entry in FileHandlerService._scan_files(directory):
+            name = entry.name.lower()
+            if not name.endswith(suffixes):
+                continue
+            if single_segment:
+                priority = priorities[os.path.splitext(name)[1]]
+            else:
+                priority = min(priorities[ext] for ext in suffixes if name.endswith(ext))
+            if best is None or priority < best[0]:
+                best = (priority, entry.path)
+                if priority == 0:
+                    break
+
+        if best:
+            project_file = Path(best[1])
+            logger.info(f"找到工程文件: {project_file}")
+            return project_file
 
         logger.warning(f"未找到工程文件，扩展名: {extensions}")
         return None
 
+    @staticmethod
+    def _scan_files(directory: Path) -> Iterator[os.DirEntry]:
+        """
+        递归遍历目录中的文件（先当前目录的文件，再依次进入子目录，不跟随符号链接）
+
+        使用 os.scandir 返回的 DirEntry 判断类型，不需要额外的 stat 调用
+
+        Args:
+            directory: 目录路径
+
+        Yields:
+            文件的 DirEntry
+        """
+        try:
+            with os.scandir(directory) as entries:
+                subdirs = []
+                for entry in entries:
+                    if entry.is_file():
+                        yield entry
+                    elif entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+        except OSError as e:
+            logger.warning(f"无法读取目录 {directory}: {e}")
+            return
+
+        for subdir in subdirs:
+            yield from FileHandlerService._scan_files(subdir)
+
     @staticmethod
     def cleanup_directory(directory: Path) -> bool:
         """
@@ -194,7 +487,12 @@ class FileHandlerService:
 
         try:
             logger.info(f"开始清理目录: {directory}")
-            shutil.rmtree(directory)
+            try:
+                FileHandlerService._parallel_rmtree(directory)
+            except OSError as e:
+                # 只读文件、文件被占用等情况交给 shutil.rmtree 处理剩余内容
+                logger.info(f"并行删除未完成（{e}），改用 shutil.rmtree")
+                shutil.rmtree(directory)
             logger.info(f"目录清理成功: {directory}")
             return True
 
@@ -202,6 +500,44 @@ class FileHandlerService:
             logger.error(f"清理目录时发生错误: {e}")
             return False
 
+    @staticmethod
+    def _parallel_rmtree(directory: Path) -> None:
+        """
+        多线程删除目录树
+
+        先用 scandir 收集文件和目录，文件由线程池并行删除（unlink 会释放GIL），
+        再从最深的目录开始依次删除空目录。不跟随符号链接，链接本身作为文件删除。
+
+        Args:
+            directory: 要删除的目录
+
+        Raises:
+            OSError: 任一文件或目录删除失败
+        """
+        files: List[str] = []
+        dirs: List[str] = [os.fspath(directory)]
+        index = 0
+        while index < len(dirs):
+            with os.scandir(dirs[index]) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False) and not _is_reparse_point(entry):
+                        dirs.append(entry.path)
+                    else:
+                        files.append(entry.path)
+            index += 1
+
+        if len(files) >= RMTREE_PARALLEL_MIN_FILES:
+            with ThreadPoolExecutor(max_workers=RMTREE_WORKERS) as executor:
+                # list() 等待全部完成，并抛出线程中的异常
+                list(executor.map(os.unlink, files, chunksize=64))
+        else:
+            for path in files:
+                os.unlink(path)
+
+        # 按广度优先顺序收集，倒序即可保证子目录先于父目录删除
+        for path in reversed(dirs):
+            os.rmdir(path)
+
     @staticmethod
     def get_directory_size(directory: Path) -> int:
         """
@@ -215,9 +551,15 @@ class FileHandlerService:
         """
         total_size = 0
         try:
-            for item in directory.rglob('*'):
-                if item.is_file():
-                    total_size += item.stat().st_size
+            for entry in FileHandlerService._scan_files(directory):
+                # 跳过符号链接；DirEntry 缓存了类型（Windows上还缓存了大小），避免额外的stat调用
+                if entry.is_symlink():
+                    continue
+                try:
+                    total_size += entry.stat(follow_symlinks=False).st_size
+                except FileNotFoundError:
+                    # 遍历过程中文件被删除
+                    continue
             return total_size
         except Exception as e:
             logger.error(f"计算目录大小时发生错误: {e}")
@@ -1,21 +1,72 @@
 """文件准备服务（下载+解压+工程文件查找）"""
+import functools
 import logging
-import shutil
+import os
+import threading
+import uuid
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Optional, Set, Tuple
 from app.config import settings
-from app.services.oss_storage import OSSStorageService
+from app.services.oss_storage import get_oss_service
 from app.services.file_handler import FileHandlerService
 from app.models.task import RenderEngine
 
 logger = logging.getLogger(__name__)
 
+# 工作空间中保存渲染日志的子目录名称
+LOGS_DIR_NAME = "logs"
+
+# OSS下载缓存目录名称（位于工作空间根目录下，按ETag分目录保存）
+OSS_CACHE_DIR_NAME = ".cache"
+
+
+@functools.lru_cache(maxsize=1024)
+def find_project_file_cached(project_dir: str, render_engine: RenderEngine) -> str:
+    """
+    根据渲染引擎类型查找工程文件，结果按 (目录, 渲染引擎) 缓存
+
+    未找到时抛出异常而不是返回None（lru_cache 不缓存异常），
+    之后重新准备的工作空间仍会重新查找。
+
+    Args:
+        project_dir: 工程目录
+        render_engine: 渲染引擎类型
+
+    Returns:
+        工程文件路径
+
+    Raises:
+        FileNotFoundError: 未找到工程文件
+        ValueError: 不支持的渲染引擎
+    """
+    # 根据渲染引擎确定文件扩展名
+    if render_engine == RenderEngine.MAYA:
+        extensions = ['.ma', '.mb']  # Maya ASCII 和 Binary 格式
+    elif render_engine == RenderEngine.UE:
+        extensions = ['.uproject']  # Unreal Engine 工程文件
+    else:
+        raise ValueError(f"不支持的渲染引擎: {render_engine}")
+
+    # 查找工程文件
+    project_file = FileHandlerService.find_project_file(
+        directory=Path(project_dir),
+        extensions=extensions
+    )
+    if project_file is None:
+        raise FileNotFoundError(f"在 {project_dir} 中未找到有效的工程文件")
+
+    return str(project_file)
+
 
 class FilePreparationService:
     """文件准备服务类，负责任务的文件下载和解压"""
 
+    # 进程内已创建过的用户目录（{workspace_root_dir}/{unionid}），同一用户的后续任务不再逐级检查
+    _created_user_dirs: Set[str] = set()
+    _created_user_dirs_lock = threading.Lock()
+
     def __init__(self):
-        self.oss_service = OSSStorageService()
+        self.oss_service = get_oss_service()
         self.file_handler = FileHandlerService()
 
     def prepare_project_files(
@@ -79,7 +130,7 @@ class FilePreparationService:
 
         流程:
         1. 创建任务隔离的工作空间目录
-        2. 如果是压缩文件，复制到工作空间目录并解压到工作空间目录
+        2. 如果是压缩文件，直接从原文件解压到工作空间目录
         3. 如果不是压缩文件，复制到工作空间目录
         4. 查找工程文件路径
         5. 返回工程文件路径、工作空间路径和渲染输出目录
@@ -107,21 +158,16 @@ class FilePreparationService:
 
             # 1. 创建任务工作空间目录结构（使用系统配置的固定目录名）
             task_workspace_dir = self._create_task_workspace(unionid, task_id)
-            renders_dir_name = settings.renders_dir_name
-
-            renders_dir = task_workspace_dir / renders_dir_name
-            renders_dir.mkdir(parents=True, exist_ok=True)
+            renders_dir = task_workspace_dir / (settings.renders_dir_name or "Renders")
+            self._ensure_dirs(renders_dir, task_workspace_dir / LOGS_DIR_NAME)
 
             logger.info(f"创建任务工作目录: {task_workspace_dir}")
             logger.info(f"使用本地文件: {file_path}")
 
             # 2. 处理压缩文件
             if is_compressed:
-                copied_file = task_workspace_dir / local_file.name
-                shutil.copy2(str(local_file), str(copied_file))
-                logger.info(f"文件为压缩格式，已复制到任务工作目录，开始解压...")
-
-                # 解压到project目录
+                # 直接从原文件解压到工作空间目录（不需要先复制压缩包）
+                logger.info(f"文件为压缩格式，开始解压...")
                 self.file_handler.decompress_file(
                     compressed_file=local_file,
                     output_dir=task_workspace_dir,
@@ -130,7 +176,9 @@ class FilePreparationService:
             else:
                 # 非压缩文件，直接复制到project目录
                 logger.info(f"文件无需解压，直接复制")
-                shutil.copy2(str(local_file), str(task_workspace_dir / local_file.name))
+                self.file_handler.stage_file(
+                    local_file, task_workspace_dir / local_file.name, hardlink=settings.local_file_hardlink
+                )
 
             # 3. 查找工程文件
             project_file = self._find_project_file(task_workspace_dir, render_engine)
@@ -145,7 +193,7 @@ class FilePreparationService:
         except Exception as e:
             logger.error(f"本地文件准备失败: {e}")
             # 清理失败的工作空间
-            if 'workspace_dir' in locals():
+            if 'task_workspace_dir' in locals():
                 self.cleanup_workspace(task_workspace_dir)
             raise
 
@@ -163,7 +211,7 @@ class FilePreparationService:
 
         流程:
         1. 创建任务隔离的工作空间目录
-        2. 从OSS下载文件到工作空间目录
+        2. 从OSS下载文件到工作空间目录（.gz 文件边下载边解压，不保存压缩包）
         3. 如果是压缩文件，解压到工作空间目录
         4. 查找工程文件路径
         5. 返回工程文件路径、工作空间路径和渲染输出目录
@@ -186,35 +234,55 @@ class FilePreparationService:
         try:
             # 1. 创建任务工作空间目录结构（使用系统配置的固定目录名）
             task_workspace_dir = self._create_task_workspace(unionid, task_id)
-            renders_dir_name = settings.renders_dir_name or "Renders"
-
-            renders_dir = task_workspace_dir / renders_dir_name
-            renders_dir.mkdir(parents=True, exist_ok=True)
+            renders_dir = task_workspace_dir / (settings.renders_dir_name or "Renders")
+            self._ensure_dirs(renders_dir, task_workspace_dir / LOGS_DIR_NAME)
 
             logger.info(f"创建任务工作目录: {task_workspace_dir}")
 
-            # 2. 从OSS下载文件到工作空间目录
-            filename = Path(oss_file_path).name
-            downloaded_file = task_workspace_dir / filename
-
-            logger.info(f"从OSS下载文件: {oss_file_path}")
-            self.oss_service.download_file(
-                oss_path=oss_file_path,
-                local_path=downloaded_file
-            )
+            # OSS路径固定以 / 分隔，直接取最后一段作为文件名（不构造Path对象）
+            filename = oss_file_path.rpartition("/")[2]
+
+            if settings.oss_download_cache:
+                # 2. 从缓存获取文件（缓存未命中时先下载到缓存）
+                cached_file = self._fetch_oss_file_cached(oss_file_path, filename)
+
+                # 3. 压缩文件直接从缓存解压；非压缩文件以硬链接放入工作空间（不支持时回退为复制）
+                if is_compressed:
+                    logger.info(f"文件为压缩格式，从缓存解压...")
+                    self.file_handler.decompress_file(
+                        compressed_file=cached_file,
+                        output_dir=task_workspace_dir,
+                        delete_after=False
+                    )
+                else:
+                    self.file_handler.stage_file(cached_file, task_workspace_dir / filename, hardlink=True)
+            elif is_compressed and filename.lower().endswith('.gz'):
+                # 2-3. gzip文件边下载边解压，压缩包本身不写入磁盘（后台线程预读，下载和解压同时进行）
+                logger.info(f"从OSS流式下载并解压文件: {oss_file_path}")
+                with self.oss_service.download_stream(oss_file_path, prefetch=True) as stream:
+                    self.file_handler.decompress_gzip_stream(stream, task_workspace_dir / filename[:-3])
+            else:
+                # 2. 从OSS下载文件到工作空间目录（zip解压需要随机访问，先完整下载）
+                downloaded_file = task_workspace_dir / filename
 
-            # 3. 处理压缩文件
-            if is_compressed:
-                logger.info(f"文件为压缩格式，开始解压...")
-                # 解压到工作空间目录
-                self.file_handler.decompress_file(
-                    compressed_file=downloaded_file,
-                    output_dir=task_workspace_dir,
-                    delete_after=False
+                logger.info(f"从OSS下载文件: {oss_file_path}")
+                self.oss_service.download_file(
+                    oss_path=oss_file_path,
+                    local_path=downloaded_file
                 )
-            else:
-                # 非压缩文件，已经在工作空间目录中，无需移动
-                logger.info(f"文件无需解压，直接使用")
+
+                # 3. 处理压缩文件
+                if is_compressed:
+                    logger.info(f"文件为压缩格式，开始解压...")
+                    # 解压到工作空间目录
+                    self.file_handler.decompress_file(
+                        compressed_file=downloaded_file,
+                        output_dir=task_workspace_dir,
+                        delete_after=False
+                    )
+                else:
+                    # 非压缩文件，已经在工作空间目录中，无需移动
+                    logger.info(f"文件无需解压，直接使用")
 
             # 4. 查找工程文件
             project_file = self._find_project_file(task_workspace_dir, render_engine)
@@ -249,17 +317,86 @@ class FilePreparationService:
         Returns:
             工作空间目录路径
         """
-        workspace_dir = settings.workspace_root_dir / unionid / str(task_id)
-        workspace_dir.mkdir(parents=True, exist_ok=True)
+        # 一次拼接完整路径，代替逐级的 Path / 运算
+        user_dir = os.path.join(settings.workspace_root_dir, unionid)
+        workspace_dir = Path(os.path.join(user_dir, str(task_id)))
+
+        if user_dir in self._created_user_dirs:
+            # 用户目录已经创建过，只需要创建任务目录
+            try:
+                os.mkdir(workspace_dir)
+                return workspace_dir
+            except FileExistsError:
+                return workspace_dir
+            except FileNotFoundError:
+                # 用户目录被手动删除，重新逐级创建
+                pass
+
+        os.makedirs(workspace_dir, exist_ok=True)
+        with self._created_user_dirs_lock:
+            self._created_user_dirs.add(user_dir)
         return workspace_dir
 
+    def _fetch_oss_file_cached(self, oss_file_path: str, filename: str) -> Path:
+        """
+        按ETag获取OSS文件的本地缓存（{workspace_root_dir}/.cache/{etag}/{filename}）
+
+        命中缓存时只需一次HEAD请求；未命中时先下载为临时文件再重命名，
+        多个Worker同时下载同一文件时不会读到不完整的缓存。
+        缓存文件会以硬链接放入任务工作空间，渲染器不能修改工程文件本身。
+
+        Args:
+            oss_file_path: OSS文件路径
+            filename: 文件名
+
+        Returns:
+            缓存文件路径
+        """
+        etag = self.oss_service.get_etag(oss_file_path)
+        cache_dir = settings.workspace_root_dir / OSS_CACHE_DIR_NAME / etag
+        cached_file = cache_dir / filename
+
+        if cached_file.exists():
+            logger.info(f"命中OSS下载缓存: {oss_file_path} -> {cached_file}")
+            return cached_file
+
+        os.makedirs(cache_dir, exist_ok=True)
+        part_file = cache_dir / f"{filename}.{uuid.uuid4().hex}.part"
+
+        logger.info(f"从OSS下载文件到缓存: {oss_file_path}")
+        self.oss_service.download_file(oss_path=oss_file_path, local_path=part_file)
+        try:
+            os.replace(part_file, cached_file)
+        except OSError:
+            # Windows 上目标文件正被其他任务使用时无法替换，此时缓存已由其他任务写入
+            part_file.unlink(missing_ok=True)
+            if not cached_file.exists():
+                raise
+        return cached_file
+
+    @staticmethod
+    def _ensure_dirs(*paths: Path) -> None:
+        """
+        创建工作空间下的子目录
+
+        父目录（工作空间）已经存在，直接调用 os.mkdir，不需要 makedirs 逐级检查
+
+        Args:
+            paths: 子目录路径
+        """
+        for path in paths:
+            try:
+                os.mkdir(path)
+            except FileExistsError:
+                pass
+
     def _find_project_file(
         self,
         project_dir: Path,
         render_engine: RenderEngine
     ) -> Optional[Path]:
         """
-        根据渲染引擎类型查找工程文件
+        根据渲染引擎类型查找工程文件（同一目录的查找结果在进程内缓存）
 
         Args:
             project_dir: 工程目录
@@ -268,21 +405,16 @@ class FilePreparationService:
         Returns:
             工程文件路径，如果未找到返回None
         """
-        # 根据渲染引擎确定文件扩展名
-        if render_engine == RenderEngine.MAYA:
-            extensions = ['.ma', '.mb']  # Maya ASCII 和 Binary 格式
-        elif render_engine == RenderEngine.UE:
-            extensions = ['.uproject']  # Unreal Engine 工程文件
-        else:
-            raise ValueError(f"不支持的渲染引擎: {render_engine}")
-
-        # 查找工程文件
-        project_file = self.file_handler.find_project_file(
-            directory=project_dir,
-            extensions=extensions
-        )
+        try:
+            project_file = find_project_file_cached(str(project_dir), render_engine)
+            if not os.path.isfile(project_file):
+                # 工作空间已被其他进程清理或重新准备，缓存结果失效
+                find_project_file_cached.cache_clear()
+                project_file = find_project_file_cached(str(project_dir), render_engine)
+        except FileNotFoundError:
+            return None
 
-        return project_file
+        return Path(project_file)
 
     def cleanup_workspace(self, workspace_dir: Path) -> bool:
         """
@@ -296,6 +428,8 @@ class FilePreparationService:
         """
         try:
             logger.info(f"清理工作空间: {workspace_dir}")
+            # 缓存中可能有该工作空间的工程文件路径
+            find_project_file_cached.cache_clear()
             return self.file_handler.cleanup_directory(workspace_dir)
         except Exception as e:
             logger.error(f"清理工作空间失败: {e}")
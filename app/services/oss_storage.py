@@ -1,5 +1,12 @@
 """阿里云OSS存储服务"""
+import functools
+import io
 import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 import oss2
@@ -7,6 +14,165 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# HTTP连接池大小（SDK默认为10）
+OSS_CONNECTION_POOL_SIZE = 32
+
+# 进度回调最多每0.1秒一次（SDK每读取一块数据就会回调）
+PROGRESS_REPORT_INTERVAL = 0.1
+
+# 并行分段下载：不小于16MB的文件按8MB分段，最多8个连接同时下载
+PARALLEL_DOWNLOAD_MIN_SIZE = 16 << 20
+PARALLEL_DOWNLOAD_PART_SIZE = 8 << 20
+PARALLEL_DOWNLOAD_WORKERS = 8
+
+# 超过100MB的文件使用断点续传下载，断点信息保存在工作空间根目录下
+RESUMABLE_DOWNLOAD_MIN_SIZE = 100 << 20
+OSS_CHECKPOINT_DIR_NAME = ".oss_checkpoint"
+
+# 分片上传：超过10MB的文件按8MB分片，4个线程并行上传（渲染帧同时在上传，线程数不宜过多）
+MULTIPART_UPLOAD_MIN_SIZE = 10 << 20
+MULTIPART_UPLOAD_PART_SIZE = 8 << 20
+MULTIPART_UPLOAD_WORKERS = 4
+
+# 流式下载预读：后台线程初始每次读取8MB，最多预读4块等待消费
+PREFETCH_CHUNK_SIZE = 8 << 20
+PREFETCH_QUEUE_SIZE = 4
+# 预读块大小随网速调整的范围（队列中最多积压约64MB）
+PREFETCH_MIN_CHUNK_SIZE = 64 << 10
+PREFETCH_MAX_CHUNK_SIZE = 16 << 20
+# 关闭预读流时等待后台线程退出的最长时间（秒）
+PREFETCH_JOIN_TIMEOUT = 5
+
+
+def _preallocate(fd: int, size: int) -> None:
+    """
+    为文件预先分配磁盘空间（Linux上使用 posix_fallocate 得到连续的存储区间，
+    其他平台或文件系统不支持时只设置文件大小）
+
+    Args:
+        fd: 文件描述符
+        size: 文件大小（字节）
+    """
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass
+    os.ftruncate(fd, size)
+
+
+def throttle_progress(progress_callback: Optional[callable]) -> Optional[callable]:
+    """
+    合并频繁的进度回调：距上次回调不足 PROGRESS_REPORT_INTERVAL 秒时跳过，完成时总会回调一次
+
+    Args:
+        progress_callback: 进度回调函数 (已传输字节数, 总字节数)，可以为None
+
+    Returns:
+        包装后的回调函数；未提供回调时返回None
+    """
+    if progress_callback is None:
+        return None
+
+    last_report = 0.0
+
+    def callback(consumed_bytes: int, total_bytes: Optional[int]) -> None:
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report >= PROGRESS_REPORT_INTERVAL or consumed_bytes == total_bytes:
+            last_report = now
+            progress_callback(consumed_bytes, total_bytes)
+
+    return callback
+
+
+class PrefetchReader(io.RawIOBase):
+    """
+    在后台线程中预读下载流的只读文件对象
+
+    网络读取和调用方的处理（如gzip解压）分别在两个线程中进行，
+    解压当前数据块的同时下一块已经在下载。
+    """
+
+    def __init__(self, source, chunk_size: int = PREFETCH_CHUNK_SIZE, depth: int = PREFETCH_QUEUE_SIZE):
+        super().__init__()
+        self._queue: queue.Queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._buffer = memoryview(b"")
+        self._eof = False
+        self._thread = threading.Thread(
+            target=self._fill, args=(source, chunk_size), name="oss-prefetch", daemon=True
+        )
+        self._thread.start()
+
+    def _fill(self, source, chunk_size: int) -> None:
+        """
+        后台线程：读取下载流放入队列，以空字节串表示结束，出错时放入异常
+
+        每块的大小随网速调整：读取一块不到0.5秒时加倍，超过2秒时减半（64KB～16MB），
+        慢速网络下队列中不会积压过大的块，快速网络下减少读取次数
+        """
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                # 只统计读取耗时，不包括等待调用方消费的时间
+                elapsed = time.monotonic() - started
+                self._put(chunk)
+
+                if elapsed < 0.5:
+                    chunk_size = min(chunk_size * 2, PREFETCH_MAX_CHUNK_SIZE)
+                elif elapsed > 2.0:
+                    chunk_size = max(chunk_size // 2, PREFETCH_MIN_CHUNK_SIZE)
+        except Exception as e:
+            self._put(e)
+            return
+        finally:
+            # 调用方提前关闭时下载流可能没有读完，关闭后连接不会以半读状态留在连接池中
+            source.close()
+        self._put(b"")
+
+    def _put(self, item) -> None:
+        # 调用方提前关闭时不再阻塞在已满的队列上
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if not self._buffer:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, Exception):
+                # 后台线程已经退出，之后的读取直接返回结束，不能再等待队列
+                self._eof = True
+                raise item
+            if not item:
+                self._eof = True
+                return 0
+            self._buffer = memoryview(item)
+
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self) -> None:
+        self._stop.set()
+        # 后台线程可能正阻塞在网络读取上，最多等待 PREFETCH_JOIN_TIMEOUT 秒
+        if self._thread.is_alive():
+            self._thread.join(timeout=PREFETCH_JOIN_TIMEOUT)
+        super().close()
+
 
 class OSSStorageService:
     """OSS存储服务类"""
@@ -33,11 +199,12 @@ class OSSStorageService:
             settings.oss_access_key_secret
         )
 
-        # 创建Bucket对象
+        # 创建Bucket对象（连接池大小覆盖并行分段下载和多帧同时上传的连接数）
         self.bucket = oss2.Bucket(
             self.auth,
             settings.oss_endpoint,
-            settings.oss_bucket_name
+            settings.oss_bucket_name,
+            session=oss2.Session(pool_size=OSS_CONNECTION_POOL_SIZE)
         )
 
     def download_file(
@@ -67,30 +234,46 @@ class OSSStorageService:
 
             logger.info(f"开始从OSS下载文件: {oss_path} -> {local_path}")
 
-            # 检查文件是否存在
-            if not self.bucket.object_exists(oss_path):
+            # 获取文件大小（同时确认文件存在）。每次下载都重新请求：同一路径的文件可能刚被重新上传，
+            # 用过期的大小预分配和切分区间会截断或损坏下载的文件
+            try:
+                meta = self.bucket.head_object(oss_path)
+            except oss2.exceptions.NotFound:
                 raise FileNotFoundError(f"OSS文件不存在: {oss_path}")
-
-            # 获取文件大小
-            file_size = self.bucket.head_object(oss_path).content_length
+            file_size = meta.content_length
             logger.info(f"文件大小: {file_size / (1024**2):.2f} MB")
 
             # 下载文件（带进度条）
-            if progress_callback:
-                # 使用流式下载以支持进度回调
-                result = self.bucket.get_object(oss_path)
-                downloaded_size = 0
-                chunk_size = 8192  # 8KB
-
-                with open(local_path, 'wb') as f:
-                    for chunk in result:
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        if progress_callback:
-                            progress_callback(downloaded_size, file_size)
+            if file_size >= RESUMABLE_DOWNLOAD_MIN_SIZE:
+                # 超大文件使用SDK的断点续传下载（同样是多线程分段下载，失败后重试时跳过已完成的分段；
+                # SDK先写入临时文件，完成后再重命名，不会留下不完整的目标文件）
+                oss2.resumable_download(
+                    self.bucket,
+                    oss_path,
+                    str(local_path),
+                    store=oss2.ResumableDownloadStore(root=str(settings.workspace_root_dir / OSS_CHECKPOINT_DIR_NAME)),
+                    multiget_threshold=RESUMABLE_DOWNLOAD_MIN_SIZE,
+                    part_size=PARALLEL_DOWNLOAD_PART_SIZE,
+                    num_threads=PARALLEL_DOWNLOAD_WORKERS,
+                    progress_callback=throttle_progress(progress_callback)
+                )
             else:
-                # 直接下载整个文件
-                self.bucket.get_object_to_file(oss_path, str(local_path))
+                # 先下载到 .part 临时文件，完成后原子替换为目标文件，
+                # 进程中途被杀时不会留下看起来完整的半截文件
+                part_path = local_path.with_name(local_path.name + ".part")
+                try:
+                    if file_size >= PARALLEL_DOWNLOAD_MIN_SIZE:
+                        # 大文件按8MB分段，多个连接并行下载
+                        self._download_ranges(oss_path, part_path, file_size, meta.etag, progress_callback)
+                    else:
+                        # 直接下载整个文件（SDK支持进度回调，不需要自己逐块读写）
+                        self.bucket.get_object_to_file(
+                            oss_path, str(part_path), progress_callback=throttle_progress(progress_callback)
+                        )
+                    os.replace(part_path, local_path)
+                except BaseException:
+                    part_path.unlink(missing_ok=True)
+                    raise
 
             logger.info(f"文件下载成功: {local_path}")
             return local_path
@@ -105,11 +288,104 @@ class OSSStorageService:
 
         except Exception as e:
             logger.error(f"下载文件时发生未知错误: {e}")
-            # 清理可能部分下载的文件
-            if local_path.exists():
-                local_path.unlink()
             raise
 
+    def _download_ranges(
+        self,
+        oss_path: str,
+        local_path: Path,
+        file_size: int,
+        etag: str,
+        progress_callback: Optional[callable] = None
+    ) -> None:
+        """
+        分段并行下载（每段一个Range请求，写入预先分配好大小的文件中的对应位置）
+
+        单个HTTP连接的吞吐受TCP窗口和往返时延限制，多个连接并行下载可以充分利用带宽
+
+        Args:
+            oss_path: OSS上的文件路径
+            local_path: 本地保存路径
+            file_size: 文件大小（字节）
+            etag: 文件的ETag，每段请求带 If-Match，文件在下载过程中被替换时请求失败，不会混合新旧两个版本
+            progress_callback: 下载进度回调函数（可选）
+
+        Raises:
+            oss2.exceptions.PreconditionFailed: 下载过程中文件被替换
+        """
+        # 预先分配文件空间，各线程只写入自己负责的区间
+        with open(local_path, 'wb') as f:
+            _preallocate(f.fileno(), file_size)
+
+        ranges = [
+            (start, min(start + PARALLEL_DOWNLOAD_PART_SIZE, file_size) - 1)
+            for start in range(0, file_size, PARALLEL_DOWNLOAD_PART_SIZE)
+        ]
+        progress_lock = threading.Lock()
+        downloaded_size = 0
+        progress_callback = throttle_progress(progress_callback)
+        headers = {"If-Match": f'"{etag}"'}
+
+        def download_range(byte_range) -> None:
+            nonlocal downloaded_size
+            start, end = byte_range
+            result = self.bucket.get_object(oss_path, byte_range=(start, end), headers=headers)
+            # 每段使用独立的文件句柄（Windows上没有 os.pwrite）
+            with open(local_path, 'r+b') as f:
+                f.seek(start)
+                while chunk := result.read(PREFETCH_CHUNK_SIZE):
+                    f.write(chunk)
+                    if progress_callback:
+                        with progress_lock:
+                            downloaded_size += len(chunk)
+                            progress_callback(downloaded_size, file_size)
+
+        logger.info(f"分{len(ranges)}段并行下载: {oss_path}")
+        with ThreadPoolExecutor(max_workers=PARALLEL_DOWNLOAD_WORKERS) as executor:
+            # list() 等待全部完成，并抛出线程中的异常
+            list(executor.map(download_range, ranges))
+
+    def download_stream(self, oss_path: str, prefetch: bool = False):
+        """
+        以流的方式读取OSS文件（不落盘，调用方边读边处理）
+
+        Args:
+            oss_path: OSS上的文件路径
+            prefetch: 是否在后台线程中预读（调用方处理数据的同时继续下载，用完后需要关闭）
+
+        Returns:
+            可读的文件对象（支持 read(size)，读完后自动校验CRC）
+
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        try:
+            logger.info(f"开始从OSS流式读取文件: {oss_path}")
+            result = self.bucket.get_object(oss_path)
+            return PrefetchReader(result) if prefetch else result
+        except oss2.exceptions.NoSuchKey:
+            logger.error(f"OSS文件不存在: {oss_path}")
+            raise FileNotFoundError(f"OSS文件不存在: {oss_path}")
+
+    def get_etag(self, oss_path: str) -> str:
+        """
+        获取OSS文件的ETag（只发送HEAD请求，不下载内容）
+
+        Args:
+            oss_path: OSS上的文件路径
+
+        Returns:
+            ETag（已去除两侧的引号，文件内容不变时ETag不变）
+
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        try:
+            return self.bucket.head_object(oss_path).etag.strip('"')
+        except oss2.exceptions.NotFound:
+            logger.error(f"OSS文件不存在: {oss_path}")
+            raise FileNotFoundError(f"OSS文件不存在: {oss_path}")
+
     def upload_file(
         self,
         local_path: Path,
@@ -130,31 +406,27 @@ class OSSStorageService:
         Raises:
             FileNotFoundError: 本地文件不存在
         """
-        if not local_path.exists():
+        # 一次stat同时确认文件存在并获取大小
+        try:
+            file_size = local_path.stat().st_size
+        except FileNotFoundError:
             raise FileNotFoundError(f"本地文件不存在: {local_path}")
 
         try:
             logger.info(f"开始上传文件到OSS: {local_path} -> {oss_path}")
-
-            file_size = local_path.stat().st_size
             logger.info(f"文件大小: {file_size / (1024**2):.2f} MB")
 
-            # 上传文件
-            if progress_callback:
-                # 使用分片上传以支持进度回调（大文件推荐）
-                if file_size > 10 * 1024 * 1024:  # 大于10MB使用分片上传
-                    oss2.resumable_upload(
-                        self.bucket,
-                        oss_path,
-                        str(local_path),
-                        progress_callback=progress_callback
-                    )
-                else:
-                    with open(local_path, 'rb') as f:
-                        self.bucket.put_object(oss_path, f, progress_callback=progress_callback)
-            else:
-                # 直接上传
-                self.bucket.put_object_from_file(oss_path, str(local_path))
+            # 上传文件：大于10MB时多线程分片上传（支持断点续传），较小的文件由SDK内部直接上传
+            oss2.resumable_upload(
+                self.bucket,
+                oss_path,
+                str(local_path),
+                store=oss2.ResumableStore(root=str(settings.workspace_root_dir / OSS_CHECKPOINT_DIR_NAME)),
+                multipart_threshold=MULTIPART_UPLOAD_MIN_SIZE,
+                part_size=MULTIPART_UPLOAD_PART_SIZE,
+                num_threads=MULTIPART_UPLOAD_WORKERS,
+                progress_callback=throttle_progress(progress_callback)
+            )
 
             logger.info(f"文件上传成功: {oss_path}")
             return oss_path
@@ -198,3 +470,19 @@ class OSSStorageService:
         except Exception as e:
             logger.error(f"检查文件存在性时发生错误: {e}")
             return False
+        except Exception as e:
+            logger.error(f"检查文件存在性时发生错误: {e}")
+            return False
+
+
+@functools.lru_cache(maxsize=1)
+def get_oss_service() -> OSSStorageService:
+    """
+    获取进程内共享的OSS服务实例
+
+    复用同一个Bucket及其HTTP连接池，避免每次上传/下载都重新建立TCP连接和TLS握手
+
+    Raises:
+        ValueError: OSS配置不完整（异常不会被缓存，修正配置后重新调用即可）
+    """
+    return OSSStorageService()
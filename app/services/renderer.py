@@ -1,4 +1,6 @@
 """渲染引擎适配器"""
+import functools
+import os
 import re
 import subprocess
 import logging
@@ -11,6 +13,81 @@ from app.models.task import RenderEngine
 
 logger = logging.getLogger(__name__)
 
+# 渲染日志直接写入文件，返回给调用方（解析输出文件、保存到帧记录）的只是末尾部分
+LOG_TAIL_BYTES = 64 * 1024
+
+# Windows 上渲染器进程不分配控制台窗口（Render.exe 等命令行程序默认会创建一个）
+_CREATION_FLAGS = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+# Maya stdout中输出文件路径的匹配模式，按优先级排序（支持多种图片格式）
+# 合并为一个正则，只扫描一遍日志；每个分支只有一个分组，匹配的 lastindex 即分支的优先级序号
+_IMAGE_EXTS = r'\.(?:exr|png|jpg|jpeg|tif|tiff|tga|bmp|iff)'
+_MAYA_STDOUT_PATTERN = re.compile(
+    '|'.join((
+        # 1. Maya 2025 Arnold格式: | [driver_exr] writing file `path.exr'
+        #    匹配反引号包围的路径，反引号后可能是单引号或反引号
+        rf'writing\s+file\s+[`\']([^`\'\n\r]+{_IMAGE_EXTS})',
+
+        # 2. 通用格式: Writing file: path
+        rf'(?:Rendering|Result|Writing\s+file):\s*([^\n\r]+{_IMAGE_EXTS})',
+
+        # 3. 简化格式: Writing path
+        rf'Writing\s+([^\n\r]+{_IMAGE_EXTS})',
+
+        # 4. 完成格式: File written: path
+        rf'File\s+written:\s*([^\n\r]+{_IMAGE_EXTS})',
+    )),
+    re.IGNORECASE
+)
+
+# 上述格式都包含的关键字（小写），不含任一关键字的文本无需运行正则
+_MAYA_STDOUT_KEYWORDS = ('writing', 'rendering', 'result', 'written')
+
+
+def _may_contain_output(text: str) -> bool:
+    """快速预检文本中是否可能出现输出文件路径（子串查找比正则扫描快得多）"""
+    lowered = text.lower()
+    return any(keyword in lowered for keyword in _MAYA_STDOUT_KEYWORDS)
+
+
+# 在输出目录中查找渲染结果时支持的文件格式
+_OUTPUT_IMAGE_EXTS = ('.exr', '.png', '.deepexr', '.jpeg', '.tif', '.maya')
+
+# UE MovieSceneCapture 支持的图片序列格式（-MovieFormat，小写即输出文件扩展名）
+_UE_OUTPUT_FORMATS = ('png', 'exr', 'jpg', 'bmp')
+
+# 输出文件名中扩展名前的最后一组数字即帧号（如 scene.0012.exr、beauty_12.png）
+_FRAME_NUMBER_RE = re.compile(r'(\d+)\D*\.[^.]+$')
+
+
+def _frame_number_from_name(file_name: str) -> Optional[int]:
+    """从渲染输出文件名中提取帧号，没有数字时返回None"""
+    match = _FRAME_NUMBER_RE.search(file_name)
+    return int(match.group(1)) if match else None
+
+
+def read_log_tail(path: Path, max_bytes: int = LOG_TAIL_BYTES) -> str:
+    """
+    读取日志文件的末尾部分
+
+    Args:
+        path: 日志文件路径
+        max_bytes: 读取的最大字节数
+
+    Returns:
+        日志末尾的文本（被截断时带有说明前缀）
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        start = max(size - max_bytes, 0)
+        f.seek(start)
+        data = f.read()
+
+    text = data.decode("utf-8", errors="replace")
+    if start > 0:
+        text = f"...（日志过长，已省略前 {start} 字节，完整日志: {path}）\n" + text
+    return text
+
 
 class BaseRenderer(ABC):
     """渲染器基类"""
@@ -26,6 +103,8 @@ class BaseRenderer(ABC):
         project_file: str,
         frame_number: int,
         output_dir: Path,
+        stdout_path: Path,
+        stderr_path: Path,
         engine_conf: Optional[dict] = None
     ) -> tuple[Path, str, str]:
         """
@@ -35,44 +114,88 @@ class BaseRenderer(ABC):
             project_file: 工程文件路径
             frame_number: 帧序号
             output_dir: 输出目录
+            stdout_path: 完整stdout日志的写入路径
+            stderr_path: 完整stderr日志的写入路径
             engine_conf: 引擎配置字典
 
         Returns:
-            (渲染结果文件路径, stdout日志, stderr日志)
+            (渲染结果文件路径, stdout日志末尾, stderr日志末尾)
         """
         pass
 
-    def _run_command(self, command: list[str], timeout: Optional[int] = None) -> tuple[str, str]:
+    # 是否支持一次启动渲染多帧（render_frames）
+    supports_batch = False
+
+    def render_frames(
+        self,
+        project_file: str,
+        frame_numbers: list[int],
+        output_dir: Path,
+        stdout_path: Path,
+        stderr_path: Path,
+        engine_conf: Optional[dict] = None
+    ) -> dict[int, Path]:
+        """
+        一次启动渲染器渲染多帧（帧序号需为等差序列），分摊渲染器启动和加载场景的开销
+
+        Args:
+            project_file: 工程文件路径
+            frame_numbers: 帧序号列表（升序）
+            output_dir: 输出目录
+            stdout_path: 完整stdout日志的写入路径
+            stderr_path: 完整stderr日志的写入路径
+            engine_conf: 引擎配置字典
+
+        Returns:
+            {帧序号: 渲染结果文件路径}，未找到输出文件的帧不在其中
+        """
+        raise NotImplementedError(f"{type(self).__name__} 不支持批量渲染")
+
+    def _run_command(
+        self,
+        command: list[str],
+        stdout_path: Path,
+        stderr_path: Path,
+        timeout: Optional[int] = None
+    ) -> tuple[str, str]:
         """
-        执行命令并捕获输出
+        执行命令，输出直接写入日志文件（不在内存中缓冲完整日志）
 
         Args:
             command: 命令列表
+            stdout_path: stdout日志文件路径
+            stderr_path: stderr日志文件路径
             timeout: 超时时间（秒）
 
         Returns:
-            (stdout, stderr)
+            (stdout末尾, stderr末尾)
         """
         try:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding='utf-8',
-                errors='replace'
-            )
-
-            stdout, stderr = process.communicate(timeout=timeout)
-
-            if process.returncode != 0:
+            # 日志目录通常在准备工程文件时已创建；在此之前准备的工作空间（如重试旧任务）没有该目录
+            stdout_path.parent.mkdir(parents=True, exist_ok=True)
+            stderr_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(stdout_path, "wb") as stdout_file, open(stderr_path, "wb") as stderr_file:
+                # subprocess.run 超时时会结束并回收子进程
+                result = subprocess.run(
+                    command,
+                    stdout=stdout_file,
+                    stderr=stderr_file,
+                    timeout=timeout,
+                    creationflags=_CREATION_FLAGS
+                )
+
+            stdout = read_log_tail(stdout_path)
+            stderr = read_log_tail(stderr_path)
+
+            if result.returncode != 0:
                 raise RuntimeError(f"渲染命令执行失败: {stderr}")
 
             return stdout, stderr
 
         except subprocess.TimeoutExpired:
-            process.kill()
             raise RuntimeError(f"渲染超时（{timeout}秒）")
+        except RuntimeError:
+            raise
         except Exception as e:
             raise RuntimeError(f"执行渲染命令时出错: {str(e)}")
 
@@ -80,11 +203,15 @@ class BaseRenderer(ABC):
 class MayaRenderer(BaseRenderer):
     """Maya渲染器"""
 
+    supports_batch = True
+
     def render_frame(
         self,
         project_file: str,
         frame_number: int,
         output_dir: Path,
+        stdout_path: Path,
+        stderr_path: Path,
         engine_conf: Optional[dict] = None
     ) -> tuple[Path, str, str]:
         """使用Maya批处理模式渲染单帧"""
@@ -111,17 +238,115 @@ class MayaRenderer(BaseRenderer):
         ]
 
         # 执行渲染
-        stdout, stderr = self._run_command(command, timeout=3600)  # 1小时超时
+        stdout, stderr = self._run_command(command, stdout_path, stderr_path, timeout=3600)  # 1小时超时
 
         # 解析输出，查找生成的文件
+        # 返回的文件已确认存在（stdout解析结果做过存在性检查，目录查找来自scandir）
         output_file = self._find_output_file(output_dir, frame_number, stdout, project_file)
 
-
-        if not output_file or not output_file.exists():
+        if output_file is None:
             raise RuntimeError(f"未找到渲染输出文件，帧号: {frame_number}")
 
         return output_file, stdout, stderr
 
+    def render_frames(
+        self,
+        project_file: str,
+        frame_numbers: list[int],
+        output_dir: Path,
+        stdout_path: Path,
+        stderr_path: Path,
+        engine_conf: Optional[dict] = None
+    ) -> dict[int, Path]:
+        """使用Maya批处理模式一次渲染多帧（-s/-e/-b 指定帧范围）"""
+
+        start, end = frame_numbers[0], frame_numbers[-1]
+        step = frame_numbers[1] - start if len(frame_numbers) > 1 else 1
+        if step <= 0 or frame_numbers != list(range(start, end + 1, step)):
+            raise ValueError(f"批量渲染的帧序号必须是递增的等差序列: {frame_numbers}")
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        if engine_conf is None:
+            engine_conf = {}
+        renderer = engine_conf.get("renderer", "arnold")
+
+        command = [
+            str(self.executable),
+            "-r", renderer,
+            "-rd", str(output_dir),
+            "-s", str(start),
+            "-e", str(end),
+            "-b", str(step),
+            project_file,
+        ]
+
+        # 超时时间按帧数累加
+        self._run_command(command, stdout_path, stderr_path, timeout=3600 * len(frame_numbers))
+
+        # 完整日志中每帧都有输出行，逐行解析（返回的日志末尾可能不包含前面的帧）
+        outputs = self._parse_outputs_from_log(stdout_path, set(frame_numbers))
+        missing = set(frame_numbers) - outputs.keys()
+        if missing:
+            # 日志中没有的帧，按文件名中的帧号在输出目录中查找
+            outputs.update(self._search_outputs_in_directory(output_dir, missing))
+
+        logger.info(f"批量渲染帧 {start}-{end}（步长 {step}），找到 {len(outputs)}/{len(frame_numbers)} 个输出文件")
+        return outputs
+
+    def _parse_outputs_from_log(self, stdout_path: Path, frame_numbers: set[int]) -> dict[int, Path]:
+        """
+        从完整的stdout日志中解析每帧的输出文件（与单帧相同：优先级最高的格式中最后一个匹配）
+
+        Args:
+            stdout_path: stdout日志文件路径
+            frame_numbers: 需要的帧序号
+
+        Returns:
+            {帧序号: 输出文件路径}（只包含文件确实存在的帧）
+        """
+        best: dict[int, tuple[int, str]] = {}
+        with open(stdout_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not _may_contain_output(line):
+                    continue
+                for match in _MAYA_STDOUT_PATTERN.finditer(line):
+                    file_path_str = match.group(match.lastindex).strip().strip('"\'`')
+                    frame_number = _frame_number_from_name(os.path.basename(file_path_str))
+                    if frame_number not in frame_numbers:
+                        continue
+                    current = best.get(frame_number)
+                    if current is None or match.lastindex <= current[0]:
+                        best[frame_number] = (match.lastindex, file_path_str)
+
+        outputs = {}
+        for frame_number, (_, file_path_str) in best.items():
+            output_file = Path(file_path_str)
+            if output_file.exists():
+                outputs[frame_number] = output_file
+        return outputs
+
+    def _search_outputs_in_directory(self, output_dir: Path, frame_numbers: set[int]) -> dict[int, Path]:
+        """
+        在输出目录中按文件名中的帧号查找多帧的渲染文件（只遍历一次目录）
+
+        Args:
+            output_dir: 输出目录
+            frame_numbers: 需要查找的帧序号
+
+        Returns:
+            {帧序号: 输出文件路径}
+        """
+        outputs = {}
+        with os.scandir(output_dir) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(_OUTPUT_IMAGE_EXTS) or not entry.is_file():
+                    continue
+                frame_number = _frame_number_from_name(entry.name)
+                if frame_number in frame_numbers and frame_number not in outputs:
+                    outputs[frame_number] = Path(entry.path)
+        return outputs
+
     def _find_output_file(self, output_dir: Path, frame_number: int, stdout: str, project_file: str) -> Optional[Path]:
         """
         从Maya输出中查找渲染结果文件
@@ -149,7 +374,7 @@ class MayaRenderer(BaseRenderer):
         possible_dirs = self._get_possible_output_directories(output_dir, project_file)
 
         for search_dir in possible_dirs:
-            if not search_dir.exists():
+            if not os.path.isdir(search_dir):
                 continue
 
             output_file = self._search_output_in_directory(search_dir, frame_number)
@@ -188,55 +413,57 @@ class MayaRenderer(BaseRenderer):
         - 其他: Writing file: path.png
         """
 
-        # 匹配常见的输出模式，按优先级排序（支持多种图片格式）
-        patterns = [
-            # Maya 2025 Arnold格式: | [driver_exr] writing file `path.exr'
-            # 匹配反引号包围的路径，反引号后可能是单引号或反引号
-            r'writing\s+file\s+[`\']([^`\'\n\r]+\.(?:exr|png|jpg|jpeg|tif|tiff|tga|bmp|iff))',
-
-            # 通用格式: Writing file: path
-            r'(?:Rendering|Result|Writing\s+file):\s*([^\n\r]+\.(?:exr|png|jpg|jpeg|tif|tiff|tga|bmp|iff))',
-
-            # 简化格式: Writing path
-            r'Writing\s+([^\n\r]+\.(?:exr|png|jpg|jpeg|tif|tiff|tga|bmp|iff))',
+        if not _may_contain_output(stdout):
+            logger.debug("stdout中没有输出文件相关的日志")
+            return None
 
-            # 完成格式: File written: path
-            r'File\s+written:\s*([^\n\r]+\.(?:exr|png|jpg|jpeg|tif|tiff|tga|bmp|iff))',
-        ]
+        # 一次扫描记录每种格式的最后一个匹配（通常是最终的输出文件）
+        last_matches = {}
+        for match in _MAYA_STDOUT_PATTERN.finditer(stdout):
+            last_matches[match.lastindex] = match.group(match.lastindex)
 
-        for pattern in patterns:
-            matches = re.findall(pattern, stdout, re.IGNORECASE)
-            if matches:
-                # 返回最后一个匹配（通常是最终的输出文件）
-                file_path_str = matches[-1].strip()
-                # 清理可能的引号、反引号和空白字符
-                file_path_str = file_path_str.strip('"\'`')
-                logger.debug(f"从stdout解析到文件路径: {file_path_str} (使用模式: {pattern})")
-                return Path(file_path_str)
+        if last_matches:
+            # 取优先级最高的格式
+            priority = min(last_matches)
+            # 清理可能的引号、反引号和空白字符
+            file_path_str = last_matches[priority].strip().strip('"\'`')
+            logger.debug(f"从stdout解析到文件路径: {file_path_str} (匹配格式: {priority})")
+            return Path(file_path_str)
 
         logger.debug("未能从stdout解析出文件路径")
         return None
 
     def _search_output_in_directory(self, output_dir: Path, frame_number: int) -> Optional[Path]:
         """
-        在输出目录中查找渲染文件（假设输出目录中只有一个渲染文件）
-        """
-
-        supported_exts = ('.exr', '.png', '.deepexr', '.jpeg', '.tif', '.maya')
-
-        # 遍历输出目录，找到第一个支持格式的图片文件
-        for file_path in output_dir.iterdir():
-            if not file_path.is_file():
-                continue
-
-            file_name_lower = file_path.name.lower()
+        在输出目录中查找指定帧的渲染文件
 
-            # 检查是否为支持的图片格式
-            if any(file_name_lower.endswith(ext) for ext in supported_exts):
-                logger.info(f"找到渲染输出文件: {file_path.name}")
-                return file_path
+        优先返回文件名中帧号与 frame_number 相同的文件；帧号不同的文件（其他帧）直接跳过，
+        文件名中没有帧号时退回第一个支持格式的图片文件（单帧输出不带帧号的情况）
+        """
 
-        logger.warning(f"在目录 {output_dir} 中未找到支持格式的渲染文件")
+        frame_str = str(frame_number)
+        fallback = None
+
+        # DirEntry 自带文件名和类型，只为找到的文件构造Path
+        with os.scandir(output_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                # 检查是否为支持的图片格式
+                if not name.lower().endswith(_OUTPUT_IMAGE_EXTS) or not entry.is_file():
+                    continue
+                # 先用子串查找排除大部分其他帧，只对可能匹配的文件解析帧号
+                if frame_str in name:
+                    if _frame_number_from_name(name) == frame_number:
+                        logger.info(f"找到渲染输出文件: {name}")
+                        return Path(entry.path)
+                elif fallback is None and _frame_number_from_name(name) is None:
+                    fallback = entry.path
+
+        if fallback is not None:
+            logger.info(f"未找到带帧号的输出文件，使用: {os.path.basename(fallback)}")
+            return Path(fallback)
+
+        logger.warning(f"在目录 {output_dir} 中未找到帧 {frame_number} 的渲染文件")
         return None
 
 
@@ -248,6 +475,8 @@ class UERenderer(BaseRenderer):
         project_file: str,
         frame_number: int,
         output_dir: Path,
+        stdout_path: Path,
+        stderr_path: Path,
         engine_conf: Optional[dict] = None
     ) -> tuple[Path, str, str]:
         """使用UE命令行模式渲染单帧"""
@@ -261,10 +490,13 @@ class UERenderer(BaseRenderer):
         res_x = engine_conf.get("resolution_x", 1920)
         res_y = engine_conf.get("resolution_y", 1080)
         quality = engine_conf.get("quality", 100)
+        # 输出图片格式，默认PNG；EXR 不做 zlib 压缩，编码开销更小，但文件更大且浏览器无法直接预览
+        output_format = str(engine_conf.get("output_format", "png")).lower()
+        if output_format not in _UE_OUTPUT_FORMATS:
+            raise ValueError(f"不支持的UE输出格式: {output_format}")
 
         # 构建UE渲染命令
         # UnrealEditor-Cmd.exe <project.uproject> -game -MovieSceneCaptureType=... -Frame=<frame>
-        output_file = output_dir / f"frame_{frame_number:04d}.png"
 
         command = [
             str(self.executable),
@@ -276,7 +508,7 @@ class UERenderer(BaseRenderer):
             f"-MovieFrameStart={frame_number}",
             f"-MovieFrameEnd={frame_number}",
             f"-MovieFolder={output_dir}",
-            "-MovieFormat=PNG",
+            f"-MovieFormat={output_format.upper()}",
             f"-MovieQuality={quality}",
             f"-ResX={res_x}",
             f"-ResY={res_y}",
@@ -289,39 +521,44 @@ class UERenderer(BaseRenderer):
         ]
 
         # 执行渲染
-        stdout, stderr = self._run_command(command, timeout=3600)
+        stdout, stderr = self._run_command(command, stdout_path, stderr_path, timeout=3600)
 
         # 查找输出文件
-        output_file = self._find_output_file(output_dir, frame_number)
+        output_file = self._find_output_file(output_dir, frame_number, output_format)
 
-        if not output_file or not output_file.exists():
+        if output_file is None:
             raise RuntimeError(f"未找到UE渲染输出文件，帧号: {frame_number}")
 
         return output_file, stdout, stderr
 
-    def _find_output_file(self, output_dir: Path, frame_number: int) -> Optional[Path]:
+    def _find_output_file(self, output_dir: Path, frame_number: int, output_format: str = "png") -> Optional[Path]:
         """查找UE渲染输出文件"""
 
-        frame_str = f"{frame_number:04d}"
+        # UE通常输出格式：<sequence_name>.<frame>.<ext>（frame_{frame_str}.<ext> 也以补零帧号结尾）
+        # 补零帧号以原始帧号结尾，因此按后缀分两级优先级，一次遍历目录即可
+        padded_suffix = f"{frame_number:04d}.{output_format}"
+        plain_suffix = f"{frame_number}.{output_format}"
 
-        # UE通常输出格式：<sequence_name>.<frame>.png
-        possible_patterns = [
-            f"*{frame_str}.png",
-            f"frame_{frame_str}.png",
-            f"*{frame_number}.png",
-        ]
+        fallback = None
+        with os.scandir(output_dir) as entries:
+            for entry in entries:
+                name = entry.name.lower()
+                if not name.endswith(plain_suffix) or not entry.is_file():
+                    continue
+                if name.endswith(padded_suffix):
+                    return Path(entry.path)
+                if fallback is None:
+                    fallback = entry.path
 
-        for pattern in possible_patterns:
-            files = list(output_dir.glob(pattern))
-            if files:
-                return files[0]
-
-        return None
+        return Path(fallback) if fallback is not None else None
 
 
+@functools.lru_cache(maxsize=None)
 def get_renderer(engine: RenderEngine) -> BaseRenderer:
     """
-    获取渲染器实例
+    获取渲染器实例（每种引擎在进程内只创建一次，渲染器不保存每帧的状态，可以在线程间共享）
+
+    可执行文件不存在时抛出的异常不会被缓存
 
     Args:
         engine: 渲染引擎类型
@@ -2,6 +2,15 @@
 from pathlib import Path
 from typing import Optional
 
+# Windows文件名非法字符替换表（str.translate 一次遍历完成替换）
+_ILLEGAL_CHARS_TABLE = str.maketrans(dict.fromkeys('<>:"/\\|?*', '_'))
+
+# 图像文件扩展名
+_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.exr', '.tif', '.tiff', '.bmp', '.gif')
+
+# 文件大小单位（从大到小）
+_SIZE_UNITS = ((1 << 30, "GB"), (1 << 20, "MB"), (1 << 10, "KB"))
+
 
 def ensure_dir_exists(directory: Path) -> Path:
     """
@@ -27,11 +36,12 @@ def get_file_size_mb(file_path: Path) -> float:
     Returns:
         文件大小（MB）
     """
-    if not file_path.exists():
+    # 直接stat，不存在时返回0（省去一次exists检查）
+    try:
+        size_bytes = file_path.stat().st_size
+    except FileNotFoundError:
         return 0.0
-
-    size_bytes = file_path.stat().st_size
-    return size_bytes / (1024 * 1024)
+    return size_bytes / (1 << 20)
 
 
 def get_safe_filename(filename: str) -> str:
@@ -44,11 +54,8 @@ def get_safe_filename(filename: str) -> str:
     Returns:
         安全的文件名
     """
-    import re
     # 移除Windows文件名非法字符
-    illegal_chars = r'[<>:"/\\|?*]'
-    safe_name = re.sub(illegal_chars, '_', filename)
-    return safe_name
+    return filename.translate(_ILLEGAL_CHARS_TABLE)
 
 
 def is_image_file(file_path: Path) -> bool:
@@ -61,8 +68,8 @@ def is_image_file(file_path: Path) -> bool:
     Returns:
         是否为图像文件
     """
-    image_extensions = {'.png', '.jpg', '.jpeg', '.exr', '.tif', '.tiff', '.bmp', '.gif'}
-    return file_path.suffix.lower() in image_extensions
+    # str.endswith 接受元组，一次调用检查全部扩展名
+    return file_path.name.lower().endswith(_IMAGE_EXTENSIONS)
 
 
 def format_file_size(size_bytes: int) -> str:
@@ -75,14 +82,10 @@ def format_file_size(size_bytes: int) -> str:
     Returns:
         格式化后的文件大小字符串
     """
-    if size_bytes < 1024:
-        return f"{size_bytes} B"
-    elif size_bytes < 1024 * 1024:
-        return f"{size_bytes / 1024:.2f} KB"
-    elif size_bytes < 1024 * 1024 * 1024:
-        return f"{size_bytes / (1024 * 1024):.2f} MB"
-    else:
-        return f"{size_bytes / (1024 * 1024 * 1024):.2f} GB"
+    for threshold, unit in _SIZE_UNITS:
+        if size_bytes >= threshold:
+            return f"{size_bytes / threshold:.2f} {unit}"
+    return f"{size_bytes} B"
 
 
 def get_frame_filename(
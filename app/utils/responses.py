@@ -0,0 +1,291 @@
+"""文件响应工具（零拷贝发送等）"""
+import hashlib
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from fastapi.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from app.config import settings
+
+# ASGI 零拷贝发送扩展名（uvicorn/hypercorn 等服务器在 scope["extensions"] 中声明）
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+# 单个字节范围，例如 "bytes=0-1023"、"bytes=1024-"、"bytes=-500"
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# 无法零拷贝时每次读取的字节数（大文件如EXR按1MB分块，减少读取和发送的次数）
+FILE_CHUNK_SIZE = 1 << 20
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """
+    支持 ASGI zerocopysend 扩展的文件响应
+
+    服务器声明了该扩展时，直接把文件对象交给服务器，由其调用 sendfile(2)
+    从页缓存发送到socket；否则退回 FileResponse 的分块读写（在线程池中读取，
+    不阻塞事件循环）。
+    """
+    chunk_size = FILE_CHUNK_SIZE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if ZEROCOPY_EXTENSION not in scope.get("extensions", {}):
+            await super().__call__(scope, receive, send)
+            return
+
+        if self.stat_result is None:
+            stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            self.set_stat_headers(stat_result)
+
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            with open(self.path, "rb") as file:
+                await send({"type": ZEROCOPY_EXTENSION, "file": file})
+
+        if self.background is not None:
+            await self.background()
+
+
+def make_etag(*parts) -> str:
+    """
+    根据廉价的标识信息（ID、修改时间、大小等）生成强ETag
+
+    Returns:
+        带双引号的ETag（RFC 9110）
+    """
+    raw = ":".join(str(part) for part in parts).encode()
+    return '"' + hashlib.blake2b(raw, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断 If-None-Match 请求头是否命中当前ETag（弱比较）
+
+    Args:
+        if_none_match: If-None-Match 请求头的值
+        etag: 当前资源的ETag
+
+    Returns:
+        是否命中（命中时应返回304）
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    current = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == current
+        for candidate in if_none_match.split(",")
+    )
+
+
+async def stat_file(path: Path) -> Optional[os.stat_result]:
+    """
+    在线程池中获取文件状态，避免慢速/网络存储上的stat阻塞事件循环
+
+    Returns:
+        文件状态；文件不存在时返回None
+    """
+    try:
+        return await anyio.to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        return None
+
+
+def cache_validators(etag: str, stat_result: os.stat_result) -> dict:
+    """构建缓存校验响应头（ETag、Last-Modified）"""
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+    }
+
+
+def is_not_modified(request_headers, etag: str, stat_result: os.stat_result) -> bool:
+    """
+    判断条件请求是否可以直接返回304
+
+    If-None-Match 优先；没有该请求头时才比较 If-Modified-Since
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return int(stat_result.st_mtime) <= since.timestamp()
+
+
+def parse_range_header(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析 Range 请求头
+
+    只支持单个字节范围，多段范围按RFC允许的方式忽略（返回完整文件）。
+
+    Args:
+        range_header: Range 请求头的值
+        file_size: 文件大小（字节）
+
+    Returns:
+        (起始偏移, 结束偏移) 闭区间；无法识别的格式返回None
+
+    Raises:
+        ValueError: 范围无法满足（应返回416）
+    """
+    match = _RANGE_RE.match(range_header.strip())
+    if not match:
+        return None
+
+    start_str, end_str = match.groups()
+    if not start_str and not end_str:
+        return None
+
+    if not start_str:
+        # 后缀范围：最后N个字节
+        suffix_length = int(end_str)
+        if suffix_length == 0:
+            raise ValueError("无法满足的范围")
+        start = max(file_size - suffix_length, 0)
+        end = file_size - 1
+    else:
+        start = int(start_str)
+        end = int(end_str) if end_str else file_size - 1
+        if start > end:
+            return None
+        end = min(end, file_size - 1)
+
+    if start >= file_size:
+        raise ValueError("无法满足的范围")
+
+    return start, end
+
+
+class RangedFileResponse(ZeroCopyFileResponse):
+    """
+    支持 HTTP Range 请求的文件响应
+
+    - 无 Range 请求头时返回完整文件（200）
+    - 单个字节范围返回 206 Partial Content，只发送请求的片段
+    - 范围无法满足时返回 416
+    """
+
+    def __init__(self, path, range_header: Optional[str] = None, **kwargs):
+        super().__init__(path, **kwargs)
+        self.range_header = range_header
+        self.headers["accept-ranges"] = "bytes"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.range_header:
+            await super().__call__(scope, receive, send)
+            return
+
+        if self.stat_result is None:
+            self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            self.set_stat_headers(self.stat_result)
+        file_size = self.stat_result.st_size
+
+        try:
+            byte_range = parse_range_header(self.range_header, file_size)
+        except ValueError:
+            response = Response(
+                status_code=416,
+                headers={"Content-Range": f"bytes */{file_size}", "Accept-Ranges": "bytes"}
+            )
+            await response(scope, receive, send)
+            return
+
+        if byte_range is None:
+            await super().__call__(scope, receive, send)
+            return
+
+        start, end = byte_range
+        count = end - start + 1
+        self.status_code = 206
+        self.headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+        self.headers["content-length"] = str(count)
+
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({"type": ZEROCOPY_EXTENSION, "file": file, "offset": start, "count": count})
+        else:
+            await self._send_slice(send, start, count)
+
+        if self.background is not None:
+            await self.background()
+
+    async def _send_slice(self, send: Send, start: int, count: int) -> None:
+        """分块读取并发送文件的指定片段"""
+        file = await anyio.to_thread.run_sync(open, self.path, "rb", 0)
+        try:
+            await anyio.to_thread.run_sync(file.seek, start)
+            remaining = count
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(file.read, min(FILE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # 文件在发送过程中被截断，结束响应体
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            file.close()
+
+
+def x_accel_response(
+    file_path: Path,
+    media_type: str,
+    headers: Optional[dict] = None
+) -> Optional[Response]:
+    """
+    构建 X-Accel-Redirect 响应，由前置的 nginx 直接发送文件
+
+    nginx 需要配置将 x_accel_prefix 映射到工作空间根目录的 internal location，例如：
+        location /internal/renders/ { internal; alias C:/workspace/; }
+
+    Args:
+        file_path: 文件路径（必须位于工作空间根目录下）
+        media_type: 响应的MIME类型
+        headers: 额外的响应头
+
+    Returns:
+        未启用 X-Accel 或文件不在工作空间内时返回None
+    """
+    if not settings.use_x_accel:
+        return None
+
+    try:
+        rel_path = file_path.resolve().relative_to(settings.workspace_root_dir.resolve())
+    except ValueError:
+        return None
+
+    redirect = settings.x_accel_prefix.rstrip("/") + "/" + quote(rel_path.as_posix())
+    response_headers = dict(headers or {})
+    response_headers["X-Accel-Redirect"] = redirect
+
+    return Response(status_code=200, media_type=media_type, headers=response_headers)